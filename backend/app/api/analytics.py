@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func, type_coerce, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import date, timedelta
+from app.database import get_db, DBUser, DBDog, DBEventRollup, EventType
+from app.models import AnalyticsResponse, AnalyticsPoint
+from app.api.auth import get_current_user
+from app.services.changes import conditional_get
+from app.services.ownership import owned_ids
+
+router = APIRouter()
+
+DEFAULT_RANGE_DAYS = 90
+
+
+def _period(granularity: str):
+    """SQL expression for the first day of the period containing a rollup day"""
+    day = DBEventRollup.day
+    if granularity == "week":
+        # Next Sunday (or the day itself), then back to that week's Monday
+        return type_coerce(func.date(day, "weekday 0", "-6 days"), Date)
+    if granularity == "month":
+        return type_coerce(func.date(day, "start of month"), Date)
+    return day
+
+
+@router.get("", response_model=AnalyticsResponse, dependencies=[Depends(conditional_get)])
+async def get_analytics(
+    granularity: Literal["day", "week", "month"] = Query("day"),
+    date_from: Optional[date] = Query(None, description=f"Inclusive; defaults to {DEFAULT_RANGE_DAYS} days before date_to"),
+    date_to: Optional[date] = Query(None, description="Inclusive; defaults to today"),
+    dog_id: Optional[List[str]] = Query(None, description="Only these dogs"),
+    event_type: Optional[List[EventType]] = Query(None, description="Only these built-in event types"),
+    custom_event_id: Optional[List[str]] = Query(None, description="Only these custom event types"),
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Event counts and average poo quality per dog, event type and period
+
+    Answered from the daily rollups, so the cost grows with the number
+    of days in the range rather than the number of events.
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_RANGE_DAYS)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+    if dog_id:
+        dog_ids = set(dog_id)
+        if await owned_ids(db, DBDog, dog_ids, current_user.id) != dog_ids:
+            raise HTTPException(status_code=403, detail="Access denied to this dog")
+        dog_clause = DBEventRollup.dog_id.in_(dog_ids)
+    else:
+        dog_clause = DBEventRollup.dog_id.in_(select(DBDog.id).where(DBDog.user_id == current_user.id))
+
+    # Rollup buckets are the event type name or the custom event ID
+    buckets = [t.name for t in event_type or []] + list(custom_event_id or [])
+
+    period = _period(granularity).label("period")
+    query = (
+        select(
+            period,
+            DBEventRollup.dog_id,
+            DBEventRollup.event_type,
+            DBEventRollup.custom_event_id,
+            func.sum(DBEventRollup.count).label("count"),
+            func.sum(DBEventRollup.poo_quality_sum).label("poo_quality_sum"),
+            func.sum(DBEventRollup.poo_quality_count).label("poo_quality_count"),
+        )
+        .where(dog_clause, DBEventRollup.day >= date_from, DBEventRollup.day <= date_to)
+        .group_by(period, DBEventRollup.dog_id, DBEventRollup.bucket)
+        .order_by(period, DBEventRollup.dog_id, DBEventRollup.bucket)
+    )
+    if buckets:
+        query = query.where(DBEventRollup.bucket.in_(buckets))
+
+    rows = (await db.execute(query)).all()
+    return AnalyticsResponse(
+        granularity=granularity,
+        date_from=date_from,
+        date_to=date_to,
+        series=[
+            AnalyticsPoint(
+                period=row.period,
+                dog_id=row.dog_id,
+                event_type=row.event_type,
+                custom_event_id=row.custom_event_id,
+                count=row.count,
+                poo_quality_avg=row.poo_quality_sum / row.poo_quality_count if row.poo_quality_count else None,
+            )
+            for row in rows
+        ]
+    )
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db, DBUser
 from app.services.auth_service import verify_google_token, create_access_token, verify_token
+from app.services.user_cache import user_cache
+from app.services.executor import run_blocking, ExecutorSaturatedError
 from app.models import GoogleAuthRequest, AuthResponse, User
 from datetime import datetime
 from jose import JWTError
@@ -9,14 +12,21 @@ from jose import JWTError
 router = APIRouter()
 
 
-def get_current_user(authorization: str = Header(...), db: Session = Depends(get_db)) -> DBUser:
+async def get_current_user(
+    request: Request,
+    authorization: str = Header(...),
+    db: AsyncSession = Depends(get_db)
+) -> DBUser:
     """
     Dependency to get current authenticated user
 
     Extracts JWT from Authorization header, verifies it,
-    and returns the user from database.
+    and returns the user from the user cache, falling back to the database.
+    The admission middleware has usually verified the token already and
+    left the user ID in request.state.
 
     Args:
+        request: The current request
         authorization: Authorization header with Bearer token
         db: Database session
 
@@ -29,21 +39,30 @@ def get_current_user(authorization: str = Header(...), db: Session = Depends(get
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
 
-    token = authorization.split(" ")[1]
-    try:
-        user_id = verify_token(token)
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is None:
+        token = authorization.split(" ")[1]
+        try:
+            user_id = verify_token(token)
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
 
-    user = db.query(DBUser).filter(DBUser.id == user_id).first()
+    user = await db.scalar(select(DBUser).where(DBUser.id == user_id))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
+    # Detach so the cached instance isn't expired by this session's commits
+    db.expunge(user)
+    user_cache.set(user)
     return user
 
 
 @router.post("/google", response_model=AuthResponse)
-async def google_auth(auth_request: GoogleAuthRequest, db: Session = Depends(get_db)):
+async def google_auth(auth_request: GoogleAuthRequest, db: AsyncSession = Depends(get_db)):
     """
     Authenticate user with Google OAuth token
 
@@ -51,12 +70,15 @@ async def google_auth(auth_request: GoogleAuthRequest, db: Session = Depends(get
     and returns a JWT access token for subsequent requests.
     """
     try:
-        user_info = verify_google_token(auth_request.token)
+        # Certificate fetch and RSA verification run off the event loop
+        user_info = await run_blocking(verify_google_token, auth_request.token)
+    except ExecutorSaturatedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
     # Create or update user
-    db_user = db.query(DBUser).filter(DBUser.id == user_info["id"]).first()
+    db_user = await db.scalar(select(DBUser).where(DBUser.id == user_info["id"]))
     if not db_user:
         db_user = DBUser(
             id=user_info["id"],
@@ -70,8 +92,9 @@ async def google_auth(auth_request: GoogleAuthRequest, db: Session = Depends(get
         db_user.picture = user_info.get("picture")
         db_user.updated_at = datetime.now()
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate(db_user.id)
 
     # Generate JWT
     access_token = create_access_token(db_user.id)
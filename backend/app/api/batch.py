@@ -0,0 +1,178 @@
+from fastapi import APIRouter, Depends
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+from app.database import get_db, DBUser, DBDog, DBVet, DBMedicine, DBCustomEvent, DBEvent, DBVetVisit, DBMedicineEvent
+from app.models import (
+    BatchRequest, BatchResponse, BatchResult,
+    Event, EventCreate, EventUpdate,
+    VetVisit, VetVisitCreate, VetVisitUpdate,
+    MedicineEvent, MedicineEventCreate, MedicineEventUpdate
+)
+from app.api.auth import get_current_user
+from app.services.ownership import owned_ids, records_with_owner
+from app.services.sync import record_deletion
+from app.services.rollups import track_event, snapshot
+from app.services import stock
+from app.services.changes import publish_change
+import uuid
+
+router = APIRouter()
+
+# Per record type: ORM model, create schema, update schema, response schema
+RECORD_TYPES = {
+    "event": (DBEvent, EventCreate, EventUpdate, Event),
+    "vet_visit": (DBVetVisit, VetVisitCreate, VetVisitUpdate, VetVisit),
+    "medicine_event": (DBMedicineEvent, MedicineEventCreate, MedicineEventUpdate, MedicineEvent),
+}
+
+# Per record type: reference field -> (ORM model, error detail)
+REFERENCES = {
+    "event": {"custom_event_id": (DBCustomEvent, "Custom event not found or access denied")},
+    "vet_visit": {"vet_id": (DBVet, "Vet not found or access denied")},
+    "medicine_event": {"medicine_id": (DBMedicine, "Medicine not found or access denied")},
+}
+
+
+class BatchError(Exception):
+    """A single operation failed; carries its HTTP-style status"""
+
+    def __init__(self, status: int, detail):
+        self.status = status
+        self.detail = detail
+
+
+def _parse(schema, data: Optional[dict]):
+    try:
+        return schema.model_validate(data or {})
+    except ValidationError as e:
+        raise BatchError(422, e.errors(include_url=False, include_context=False))
+
+
+@router.post("", response_model=BatchResponse)
+async def batch(
+    request: BatchRequest,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply many event, vet visit and medicine event mutations at once
+
+    Ownership of every referenced dog, vet, medicine, custom event and
+    existing record is checked with one query per table, and all successful
+    operations are committed in a single transaction. Each operation gets
+    its own result (201 created, 200 updated, 204 deleted, or an error
+    status). Failed operations are skipped unless atomic is true, in
+    which case nothing is applied.
+    """
+    operations = request.operations
+    payloads: Dict[int, object] = {}
+    results: List[Optional[BatchResult]] = [None] * len(operations)
+
+    # Validate payloads first so referenced IDs can be collected
+    for index, operation in enumerate(operations):
+        _, create_schema, update_schema, _ = RECORD_TYPES[operation.type]
+        try:
+            if operation.op != "create" and not operation.id:
+                raise BatchError(400, "id is required for update and delete")
+            if operation.op == "create":
+                payload = _parse(create_schema, operation.data)
+                if operation.type == "event":
+                    if not payload.event_type and not payload.custom_event_id:
+                        raise BatchError(400, "Either event_type or custom_event_id must be provided")
+                    if payload.event_type and payload.custom_event_id:
+                        raise BatchError(400, "Cannot specify both event_type and custom_event_id")
+                payloads[index] = payload
+            elif operation.op == "update":
+                payloads[index] = _parse(update_schema, operation.data)
+        except BatchError as e:
+            results[index] = BatchResult(index=index, status=e.status, id=operation.id, detail=e.detail)
+
+    # Set-based ownership lookups: one query per referenced table
+    dog_ids = {getattr(p, "dog_id", None) for p in payloads.values()}
+    allowed_dogs = await owned_ids(db, DBDog, dog_ids, current_user.id)
+    allowed_refs = {}
+    for record_type, references in REFERENCES.items():
+        for field, (ref_model, _) in references.items():
+            ids = {getattr(payloads[i], field, None) for i, o in enumerate(operations) if o.type == record_type and i in payloads}
+            allowed_refs[(record_type, field)] = await owned_ids(db, ref_model, ids, current_user.id)
+    existing = {}
+    for record_type, (model, _, _, _) in RECORD_TYPES.items():
+        ids = {o.id for o in operations if o.type == record_type and o.op != "create"}
+        existing[record_type] = await records_with_owner(db, model, ids)
+
+    applied = []
+    deleted = set()
+    for index, operation in enumerate(operations):
+        if results[index] is not None:
+            continue
+        model = RECORD_TYPES[operation.type][0]
+        payload = payloads.get(index)
+        try:
+            record = None
+            if operation.op != "create":
+                found = existing[operation.type].get(operation.id)
+                if not found or (operation.type, operation.id) in deleted:
+                    raise BatchError(404, "Record not found")
+                record, owner = found
+                if owner != current_user.id:
+                    raise BatchError(403, "Access denied")
+
+            if payload is not None:
+                if payload.dog_id is not None and payload.dog_id not in allowed_dogs:
+                    raise BatchError(404, "Dog not found or access denied")
+                for field, (_, detail) in REFERENCES[operation.type].items():
+                    value = getattr(payload, field)
+                    if value is not None and value not in allowed_refs[(operation.type, field)]:
+                        raise BatchError(404, detail)
+
+            if operation.op == "create":
+                record = model(id=str(uuid.uuid4()), user_id=current_user.id, **payload.model_dump())
+                db.add(record)
+                if operation.type == "event":
+                    await track_event(db, None, snapshot(record))
+                elif operation.type == "medicine_event":
+                    await stock.track_dose(db, None, stock.snapshot(record))
+                applied.append((index, operation, record, 201))
+            elif operation.op == "update":
+                before = snapshot(record) if operation.type == "event" else None
+                dose_before = stock.snapshot(record) if operation.type == "medicine_event" else None
+                # Update only provided fields
+                for field, value in payload.model_dump(exclude_none=True).items():
+                    setattr(record, field, value)
+                if before is not None:
+                    await track_event(db, before, snapshot(record))
+                if dose_before is not None:
+                    await stock.track_dose(db, dose_before, stock.snapshot(record))
+                applied.append((index, operation, record, 200))
+            else:
+                await record_deletion(db, current_user.id, operation.type, record.id)
+                if operation.type == "event":
+                    await track_event(db, snapshot(record), None)
+                await db.delete(record)
+                if operation.type == "medicine_event":
+                    await stock.track_dose(db, stock.snapshot(record), None)
+                deleted.add((operation.type, record.id))
+                applied.append((index, operation, record, 204))
+        except BatchError as e:
+            results[index] = BatchResult(index=index, status=e.status, id=operation.id, detail=e.detail)
+
+    failed = any(result is not None for result in results)
+    if request.atomic and failed:
+        await db.rollback()
+        for index, operation, _, _ in applied:
+            results[index] = BatchResult(index=index, status=424, id=operation.id, detail="Not applied: another operation failed")
+        return BatchResponse(applied=0, results=results)
+
+    await db.commit()
+    for index, operation, record, status in applied:
+        response_schema = RECORD_TYPES[operation.type][3]
+        publish_change(current_user.id, operation.type, record.id, operation.op)
+        results[index] = BatchResult(
+            index=index,
+            status=status,
+            id=record.id,
+            record=response_schema.model_validate(record) if status != 204 else None
+        )
+
+    return BatchResponse(applied=len(applied), results=results)
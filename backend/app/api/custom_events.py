@@ -1,35 +1,48 @@
 """
 API endpoints for managing custom event types
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import uuid
 
 from app.database import get_db, DBCustomEvent, DBUser
 from app.models import CustomEvent, CustomEventCreate, CustomEventUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.rollups import forget_rollups
+from app.services.changes import publish_change, conditional_get
+from app.services.ownership import update_owned
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.response_cache import CachedResponse, cached_list
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[CustomEvent])
-def get_custom_events(
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_user)
+@router.get("", response_model=List[CustomEvent], dependencies=[Depends(conditional_get)])
+async def get_custom_events(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user),
+    fields: FieldSet = Depends(field_set(CustomEvent, DBCustomEvent)),
+    cached: CachedResponse = Depends(cached_list("custom_events"))
 ):
-    """Get all custom events for the current user"""
-    custom_events = db.query(DBCustomEvent).filter(
+    """Get all custom events for the current user; fields=id,name,... returns only those keys"""
+    hit = cached.lookup(response)
+    if hit is not None:
+        return hit
+    rows = (await db.execute(fields.select().where(
         DBCustomEvent.user_id == current_user.id
-    ).all()
+    ))).all()
 
-    return custom_events
+    return cached.store(json_rows(rows, fields, response))
 
 
 @router.post("", response_model=CustomEvent, status_code=status.HTTP_201_CREATED)
-def create_custom_event(
+async def create_custom_event(
     custom_event: CustomEventCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
     """Create a new custom event type"""
@@ -41,23 +54,23 @@ def create_custom_event(
     )
 
     db.add(db_custom_event)
-    db.commit()
-    db.refresh(db_custom_event)
+    await db.commit()
+    publish_change(current_user.id, "custom_event", db_custom_event.id, "create")
 
     return db_custom_event
 
 
 @router.get("/{custom_event_id}", response_model=CustomEvent)
-def get_custom_event(
+async def get_custom_event(
     custom_event_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
     """Get a specific custom event by ID"""
-    custom_event = db.query(DBCustomEvent).filter(
+    custom_event = await db.scalar(select(DBCustomEvent).where(
         DBCustomEvent.id == custom_event_id,
         DBCustomEvent.user_id == current_user.id
-    ).first()
+    ))
 
     if not custom_event:
         raise HTTPException(
@@ -69,18 +82,17 @@ def get_custom_event(
 
 
 @router.put("/{custom_event_id}", response_model=CustomEvent)
-def update_custom_event(
+async def update_custom_event(
     custom_event_id: str,
     custom_event_update: CustomEventUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
     """Update a custom event type"""
-    # Get existing custom event
-    db_custom_event = db.query(DBCustomEvent).filter(
-        DBCustomEvent.id == custom_event_id,
-        DBCustomEvent.user_id == current_user.id
-    ).first()
+    # Update only provided fields, in one UPDATE ... RETURNING scoped to the user
+    db_custom_event = await update_owned(
+        db, DBCustomEvent, custom_event_id, custom_event_update.model_dump(exclude_none=True), current_user.id
+    )
 
     if not db_custom_event:
         raise HTTPException(
@@ -88,28 +100,24 @@ def update_custom_event(
             detail="Custom event not found"
         )
 
-    # Update fields
-    if custom_event_update.name is not None:
-        db_custom_event.name = custom_event_update.name
-
-    db.commit()
-    db.refresh(db_custom_event)
+    await db.commit()
+    publish_change(current_user.id, "custom_event", db_custom_event.id, "update")
 
     return db_custom_event
 
 
 @router.delete("/{custom_event_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_custom_event(
+async def delete_custom_event(
     custom_event_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
     """Delete a custom event type and all associated timeline entries"""
     # Get existing custom event
-    db_custom_event = db.query(DBCustomEvent).filter(
+    db_custom_event = await db.scalar(select(DBCustomEvent).where(
         DBCustomEvent.id == custom_event_id,
         DBCustomEvent.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_custom_event:
         raise HTTPException(
@@ -117,8 +125,12 @@ def delete_custom_event(
             detail="Custom event not found"
         )
 
+    await record_deletion(db, current_user.id, "custom_event", db_custom_event.id)
+    await forget_rollups(db, custom_event_id=db_custom_event.id)
+
     # Delete the custom event (cascade will delete all related events)
-    db.delete(db_custom_event)
-    db.commit()
+    await db.delete(db_custom_event)
+    await db.commit()
+    publish_change(current_user.id, "custom_event", db_custom_event.id, "delete")
 
     return None
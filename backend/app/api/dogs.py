@@ -1,29 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database import get_db, DBDog, DBUser
+from app.database import get_db, DBDog, DBUser, DBMedicineEvent
 from app.models import Dog, DogCreate, DogUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.rollups import forget_rollups
+from app.services.stock import refresh_stock
+from app.services.changes import publish_change, conditional_get
+from app.services.ownership import update_owned
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.response_cache import CachedResponse, cached_list
 import uuid
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[Dog])
+@router.get("", response_model=List[Dog], dependencies=[Depends(conditional_get)])
 async def get_dogs(
+    response: Response,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    fields: FieldSet = Depends(field_set(Dog, DBDog)),
+    cached: CachedResponse = Depends(cached_list("dogs"))
 ):
-    """Get all dogs for the current user"""
-    dogs = db.query(DBDog).filter(DBDog.user_id == current_user.id).all()
-    return dogs
+    """Get all dogs for the current user; fields=id,name,... returns only those keys"""
+    hit = cached.lookup(response)
+    if hit is not None:
+        return hit
+    rows = (await db.execute(fields.select().where(DBDog.user_id == current_user.id))).all()
+    return cached.store(json_rows(rows, fields, response))
 
 
 @router.post("", response_model=Dog, status_code=201)
 async def create_dog(
     dog: DogCreate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new dog for the current user"""
     db_dog = DBDog(
@@ -33,8 +47,8 @@ async def create_dog(
         profile_picture=dog.profile_picture
     )
     db.add(db_dog)
-    db.commit()
-    db.refresh(db_dog)
+    await db.commit()
+    publish_change(current_user.id, "dog", db_dog.id, "create")
     return db_dog
 
 
@@ -42,13 +56,13 @@ async def create_dog(
 async def get_dog(
     dog_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific dog by ID"""
-    dog = db.query(DBDog).filter(
+    dog = await db.scalar(select(DBDog).where(
         DBDog.id == dog_id,
         DBDog.user_id == current_user.id
-    ).first()
+    ))
 
     if not dog:
         raise HTTPException(status_code=404, detail="Dog not found")
@@ -61,25 +75,17 @@ async def update_dog(
     dog_id: str,
     dog_update: DogUpdate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a dog's information"""
-    db_dog = db.query(DBDog).filter(
-        DBDog.id == dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
+    # Update only provided fields, in one UPDATE ... RETURNING scoped to the user
+    db_dog = await update_owned(db, DBDog, dog_id, dog_update.model_dump(exclude_none=True), current_user.id)
 
     if not db_dog:
         raise HTTPException(status_code=404, detail="Dog not found")
 
-    # Update only provided fields
-    if dog_update.name is not None:
-        db_dog.name = dog_update.name
-    if dog_update.profile_picture is not None:
-        db_dog.profile_picture = dog_update.profile_picture
-
-    db.commit()
-    db.refresh(db_dog)
+    await db.commit()
+    publish_change(current_user.id, "dog", db_dog.id, "update")
     return db_dog
 
 
@@ -87,17 +93,25 @@ async def update_dog(
 async def delete_dog(
     dog_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a dog (and all associated events)"""
-    db_dog = db.query(DBDog).filter(
+    db_dog = await db.scalar(select(DBDog).where(
         DBDog.id == dog_id,
         DBDog.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_dog:
         raise HTTPException(status_code=404, detail="Dog not found")
 
-    db.delete(db_dog)
-    db.commit()
+    await record_deletion(db, current_user.id, "dog", db_dog.id)
+    await forget_rollups(db, dog_id=db_dog.id)
+    # Stock totals of the medicines this dog was given are recomputed without its doses
+    medicine_ids = (await db.scalars(
+        select(DBMedicineEvent.medicine_id).where(DBMedicineEvent.dog_id == db_dog.id).distinct()
+    )).all()
+    await db.delete(db_dog)
+    await refresh_stock(db, medicine_ids)
+    await db.commit()
+    publish_change(current_user.id, "dog", db_dog.id, "delete")
     return None
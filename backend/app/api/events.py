@@ -1,43 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db, DBEvent, DBUser, DBDog
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_db, DBEvent, DBUser, DBDog, DBCustomEvent
 from app.models import Event, EventCreate, EventUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.rollups import track_event, snapshot
+from app.services.changes import publish_change, conditional_get
+from app.services.ownership import Reference, owned_ids, check_references, fetch_owned, update_owned, delete_owned
+from app.services.filters import EventFilter, event_filter
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.pagination import keyset_paginate, page_results, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 import uuid
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[Event])
+@router.get("", response_model=List[Event], dependencies=[Depends(conditional_get)])
 async def get_events(
+    response: Response,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    dog_id: str = None
+    db: AsyncSession = Depends(get_db),
+    filters: EventFilter = Depends(event_filter),
+    fields: FieldSet = Depends(field_set(Event, DBEvent)),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    unpaginated: bool = Query(False, alias="all")
 ):
-    """Get all events for the current user, optionally filtered by dog_id"""
-    # Get all dog IDs that belong to the current user
-    user_dog_ids = [dog.id for dog in db.query(DBDog).filter(DBDog.user_id == current_user.id).all()]
+    """
+    Get events for the current user, newest first, optionally filtered
 
-    # Build query to get events only for user's dogs
-    query = db.query(DBEvent).filter(DBEvent.dog_id.in_(user_dog_ids))
+    Results are paginated by (date, id): pass the X-Next-Cursor response
+    header back as cursor to fetch the next page. all=true returns the
+    full history in one response. fields=id,date,... returns only those
+    keys.
+    """
+    # Requested dogs must be the user's; only they are looked up
+    filters.check_dogs(await owned_ids(db, DBDog, filters.dog_ids, current_user.id))
 
-    # Optional filter by specific dog
-    if dog_id:
-        if dog_id not in user_dog_ids:
-            raise HTTPException(status_code=403, detail="Access denied to this dog")
-        query = query.filter(DBEvent.dog_id == dog_id)
+    # Build query to get the user's events from the (user_id, date) index,
+    # selecting just the requested fields (plus the cursor's) so no ORM
+    # objects are built
+    query = fields.select("date", "id").where(DBEvent.user_id == current_user.id)
+
+    # Optional filters (dogs, date range, time of day, ...)
+    query = query.where(*filters.compile(DBEvent))
 
     # Order by date descending (most recent first)
-    events = query.order_by(DBEvent.date.desc()).all()
-    return events
+    if unpaginated:
+        return json_rows((await db.execute(query.order_by(DBEvent.date.desc(), DBEvent.id.desc()))).all(), fields, response)
+
+    rows = (await db.execute(keyset_paginate(query, DBEvent, cursor, limit))).all()
+    events, next_cursor = page_results(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_rows(events, fields, response)
 
 
 @router.post("", response_model=Event, status_code=201)
 async def create_event(
     event: EventCreate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new health event"""
     # Validate that either event_type or custom_event_id is provided (not both, not neither)
@@ -46,28 +70,18 @@ async def create_event(
     if event.event_type and event.custom_event_id:
         raise HTTPException(status_code=400, detail="Cannot specify both event_type and custom_event_id")
 
-    # Verify the dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=404, detail="Dog not found or access denied")
-
-    # If custom_event_id is provided, verify it belongs to the current user
+    # Verify the dog (and custom event, if any) belong to the current user
+    references = [Reference("dog_id", DBDog, event.dog_id, "Dog not found or access denied")]
     if event.custom_event_id:
-        from app.database import DBCustomEvent
-        custom_event = db.query(DBCustomEvent).filter(
-            DBCustomEvent.id == event.custom_event_id,
-            DBCustomEvent.user_id == current_user.id
-        ).first()
-        if not custom_event:
-            raise HTTPException(status_code=404, detail="Custom event not found or access denied")
+        references.append(Reference(
+            "custom_event_id", DBCustomEvent, event.custom_event_id, "Custom event not found or access denied"
+        ))
+    await check_references(db, current_user.id, references)
 
     db_event = DBEvent(
         id=str(uuid.uuid4()),
         dog_id=event.dog_id,
+        user_id=current_user.id,
         event_type=event.event_type,
         custom_event_id=event.custom_event_id,
         date=event.date,
@@ -77,8 +91,9 @@ async def create_event(
         notes=event.notes
     )
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    await track_event(db, None, snapshot(db_event))
+    await db.commit()
+    publish_change(current_user.id, "event", db_event.id, "create")
     return db_event
 
 
@@ -86,24 +101,10 @@ async def create_event(
 async def get_event(
     event_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific event by ID"""
-    event = db.query(DBEvent).filter(DBEvent.id == event_id).first()
-
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    # Verify the event's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    return event
+    return await fetch_owned(db, DBEvent, event_id, current_user.id, "Event not found")
 
 
 @router.put("/{event_id}", response_model=Event)
@@ -111,60 +112,28 @@ async def update_event(
     event_id: str,
     event_update: EventUpdate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update an event's information"""
-    db_event = db.query(DBEvent).filter(DBEvent.id == event_id).first()
-
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    # Verify the event's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == db_event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # If changing the dog_id, verify the new dog also belongs to the user
-    if event_update.dog_id is not None and event_update.dog_id != db_event.dog_id:
-        new_dog = db.query(DBDog).filter(
-            DBDog.id == event_update.dog_id,
-            DBDog.user_id == current_user.id
-        ).first()
-        if not new_dog:
-            raise HTTPException(status_code=404, detail="New dog not found or access denied")
-        db_event.dog_id = event_update.dog_id
-
-    # If changing the custom_event_id, verify it belongs to the user
-    if event_update.custom_event_id is not None:
-        from app.database import DBCustomEvent
-        custom_event = db.query(DBCustomEvent).filter(
-            DBCustomEvent.id == event_update.custom_event_id,
-            DBCustomEvent.user_id == current_user.id
-        ).first()
-        if not custom_event:
-            raise HTTPException(status_code=404, detail="Custom event not found or access denied")
-        db_event.custom_event_id = event_update.custom_event_id
-
     # Update only provided fields
-    if event_update.event_type is not None:
-        db_event.event_type = event_update.event_type
-    if event_update.date is not None:
-        db_event.date = event_update.date
-    if event_update.time_of_day is not None:
-        db_event.time_of_day = event_update.time_of_day
-    if event_update.poo_quality is not None:
-        db_event.poo_quality = event_update.poo_quality
-    if event_update.vomit_quality is not None:
-        db_event.vomit_quality = event_update.vomit_quality
-    if event_update.notes is not None:
-        db_event.notes = event_update.notes
-
-    db.commit()
-    db.refresh(db_event)
+    values = event_update.model_dump(exclude_none=True)
+
+    # A new dog or custom event must also belong to the user; checked in the same query as the event
+    references = []
+    if "dog_id" in values:
+        references.append(Reference("dog_id", DBDog, values["dog_id"], "New dog not found or access denied"))
+    if "custom_event_id" in values:
+        references.append(Reference(
+            "custom_event_id", DBCustomEvent, values["custom_event_id"], "Custom event not found or access denied"
+        ))
+    before = await fetch_owned(db, DBEvent, event_id, current_user.id, "Event not found", references)
+    if not values:
+        return before
+
+    db_event = await update_owned(db, DBEvent, event_id, values)
+    await track_event(db, snapshot(before), snapshot(db_event))
+    await db.commit()
+    publish_change(current_user.id, "event", db_event.id, "update")
     return db_event
 
 
@@ -172,23 +141,12 @@ async def update_event(
 async def delete_event(
     event_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete an event"""
-    db_event = db.query(DBEvent).filter(DBEvent.id == event_id).first()
-
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    # Verify the event's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == db_event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    db.delete(db_event)
-    db.commit()
+    db_event = await delete_owned(db, DBEvent, event_id, current_user.id, "Event not found")
+    await record_deletion(db, current_user.id, "event", db_event.id)
+    await track_event(db, snapshot(db_event), None)
+    await db.commit()
+    publish_change(current_user.id, "event", db_event.id, "delete")
     return None
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal
+from datetime import date
+from app.database import DBUser
+from app.api.auth import get_current_user
+from app.services.export import export_rows
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+@router.get("")
+async def export(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    include_pictures: bool = Query(False, description="Include base64 dog profile pictures"),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Download the user's dogs, vets, medicines, custom events, events,
+    vet visits and medicine events
+
+    The response is streamed as it is read from the database, so memory
+    use does not depend on the size of the history.
+    """
+    filename = f"barkly-export-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        export_rows(current_user.id, format, include_pictures),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse
+from typing import List, Literal, Optional
+from app.models import ImportReport
+from app.api.auth import get_current_user
+from app.database import DBUser, engine
+from app.services.executor import run_blocking
+from app.services.importer import ImportStats, import_records, detect_format, RECORD_TYPES
+from app.services.changes import publish_change
+import io
+import json
+import os
+
+router = APIRouter()
+
+# Rejected rows returned in the response; the CLI writes all of them to a file
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+
+class ErrorCollector:
+    """Text sink for import_records keeping only the first few rejected rows"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.errors: List[dict] = []
+
+    def write(self, line: str) -> None:
+        if len(self.errors) < self.limit:
+            self.errors.append(json.loads(line))
+
+
+class CommittedCounts:
+    """Progress callback remembering the counters as of the last committed chunk"""
+
+    def __init__(self):
+        self.report = ImportStats().to_dict()
+
+    def __call__(self, stats: ImportStats) -> None:
+        self.report = stats.to_dict()
+
+
+def run_import(
+    file: UploadFile,
+    user_id: str,
+    fmt: str,
+    default_type: Optional[str],
+    committed: CommittedCounts
+) -> dict:
+    """Stream the spooled upload through the importer (blocking)"""
+    collector = ErrorCollector(IMPORT_MAX_REPORTED_ERRORS)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        stats = import_records(
+            engine, user_id, stream, fmt, default_type=default_type, errors=collector, progress=committed
+        )
+    finally:
+        stream.detach()
+    return {**stats.to_dict(), "errors": collector.errors}
+
+
+@router.post("", response_model=ImportReport)
+async def import_file(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the file extension"),
+    type: Optional[Literal["event", "vet_visit", "medicine_event"]] = Query(
+        None, description="Record type for rows without a type column"
+    ),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Bulk import events, vet visits and medicine events from CSV or NDJSON
+
+    Dogs, vets, medicines and custom events may be referenced by name or
+    ID. Valid rows are inserted in chunks and stay inserted even if other
+    rows are rejected; rejected rows are reported with their line number.
+    A file that turns out not to be UTF-8 part way through is rejected
+    with 400, and the error body carries the counts of the chunks
+    committed before that point.
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format. Use a .csv or .ndjson file or pass format")
+
+    committed = CommittedCounts()
+    try:
+        report = await run_blocking(run_import, file, current_user.id, fmt, type, committed)
+    except UnicodeDecodeError:
+        return JSONResponse(status_code=400, content={"detail": "File must be UTF-8 encoded", **committed.report})
+    finally:
+        # Committed chunks stay even when a later one fails
+        for record_type in RECORD_TYPES:
+            if committed.report["inserted"][record_type]:
+                publish_change(current_user.id, record_type, None, "create")
+
+    return report
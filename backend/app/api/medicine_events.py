@@ -1,66 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database import get_db, DBMedicineEvent, DBUser, DBDog, DBMedicine
 from app.models import MedicineEvent, MedicineEventCreate, MedicineEventUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.stock import track_dose, snapshot
+from app.services.changes import publish_change, conditional_get
+from app.services.ownership import Reference, owned_ids, check_references, fetch_owned, update_owned, delete_owned
+from app.services.filters import MedicineEventFilter, medicine_event_filter
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.pagination import keyset_paginate, page_results, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 import uuid
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[MedicineEvent])
+@router.get("", response_model=List[MedicineEvent], dependencies=[Depends(conditional_get)])
 async def get_medicine_events(
+    response: Response,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    dog_id: str = None
+    db: AsyncSession = Depends(get_db),
+    filters: MedicineEventFilter = Depends(medicine_event_filter),
+    fields: FieldSet = Depends(field_set(MedicineEvent, DBMedicineEvent)),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    unpaginated: bool = Query(False, alias="all")
 ):
-    """Get all medicine events for the current user, optionally filtered by dog_id"""
-    # Get all dog IDs that belong to the current user
-    user_dog_ids = [dog.id for dog in db.query(DBDog).filter(DBDog.user_id == current_user.id).all()]
+    """
+    Get medicine events for the current user, newest first, optionally filtered
 
-    # Build query to get medicine events only for user's dogs
-    query = db.query(DBMedicineEvent).filter(DBMedicineEvent.dog_id.in_(user_dog_ids))
+    Results are paginated by (date, id): pass the X-Next-Cursor response
+    header back as cursor to fetch the next page. all=true returns the
+    full history in one response. fields=id,date,... returns only those
+    keys.
+    """
+    # Requested dogs must be the user's; only they are looked up
+    filters.check_dogs(await owned_ids(db, DBDog, filters.dog_ids, current_user.id))
 
-    # Optional filter by specific dog
-    if dog_id:
-        if dog_id not in user_dog_ids:
-            raise HTTPException(status_code=403, detail="Access denied to this dog")
-        query = query.filter(DBMedicineEvent.dog_id == dog_id)
+    # Build query to get the user's medicine events from the (user_id, date) index,
+    # selecting just the requested fields (plus the cursor's) so no ORM
+    # objects are built
+    query = fields.select("date", "id").where(DBMedicineEvent.user_id == current_user.id)
+
+    # Optional filters (dogs, date range, time of day, ...)
+    query = query.where(*filters.compile(DBMedicineEvent))
 
     # Order by date descending (most recent first)
-    medicine_events = query.order_by(DBMedicineEvent.date.desc()).all()
-    return medicine_events
+    if unpaginated:
+        return json_rows((await db.execute(query.order_by(DBMedicineEvent.date.desc(), DBMedicineEvent.id.desc()))).all(), fields, response)
+
+    rows = (await db.execute(keyset_paginate(query, DBMedicineEvent, cursor, limit))).all()
+    medicine_events, next_cursor = page_results(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_rows(medicine_events, fields, response)
 
 
 @router.post("", response_model=MedicineEvent, status_code=201)
 async def create_medicine_event(
     medicine_event: MedicineEventCreate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new medicine administration record"""
-    # Verify the dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == medicine_event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=404, detail="Dog not found or access denied")
-
-    # Verify the medicine belongs to the current user
-    medicine = db.query(DBMedicine).filter(
-        DBMedicine.id == medicine_event.medicine_id,
-        DBMedicine.user_id == current_user.id
-    ).first()
-
-    if not medicine:
-        raise HTTPException(status_code=404, detail="Medicine not found or access denied")
+    # Verify the dog and the medicine belong to the current user
+    await check_references(db, current_user.id, [
+        Reference("dog_id", DBDog, medicine_event.dog_id, "Dog not found or access denied"),
+        Reference("medicine_id", DBMedicine, medicine_event.medicine_id, "Medicine not found or access denied"),
+    ])
 
     db_medicine_event = DBMedicineEvent(
         id=str(uuid.uuid4()),
         dog_id=medicine_event.dog_id,
+        user_id=current_user.id,
         medicine_id=medicine_event.medicine_id,
         date=medicine_event.date,
         time_of_day=medicine_event.time_of_day,
@@ -68,8 +81,9 @@ async def create_medicine_event(
         notes=medicine_event.notes
     )
     db.add(db_medicine_event)
-    db.commit()
-    db.refresh(db_medicine_event)
+    await track_dose(db, None, snapshot(db_medicine_event))
+    await db.commit()
+    publish_change(current_user.id, "medicine_event", db_medicine_event.id, "create")
     return db_medicine_event
 
 
@@ -77,24 +91,10 @@ async def create_medicine_event(
 async def get_medicine_event(
     medicine_event_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific medicine event by ID"""
-    medicine_event = db.query(DBMedicineEvent).filter(DBMedicineEvent.id == medicine_event_id).first()
-
-    if not medicine_event:
-        raise HTTPException(status_code=404, detail="Medicine event not found")
-
-    # Verify the medicine event's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == medicine_event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    return medicine_event
+    return await fetch_owned(db, DBMedicineEvent, medicine_event_id, current_user.id, "Medicine event not found")
 
 
 @router.put("/{medicine_event_id}", response_model=MedicineEvent)
@@ -102,55 +102,30 @@ async def update_medicine_event(
     medicine_event_id: str,
     medicine_event_update: MedicineEventUpdate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a medicine event's information"""
-    db_medicine_event = db.query(DBMedicineEvent).filter(DBMedicineEvent.id == medicine_event_id).first()
-
-    if not db_medicine_event:
-        raise HTTPException(status_code=404, detail="Medicine event not found")
-
-    # Verify the medicine event's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == db_medicine_event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # If changing the dog_id, verify the new dog also belongs to the user
-    if medicine_event_update.dog_id is not None and medicine_event_update.dog_id != db_medicine_event.dog_id:
-        new_dog = db.query(DBDog).filter(
-            DBDog.id == medicine_event_update.dog_id,
-            DBDog.user_id == current_user.id
-        ).first()
-        if not new_dog:
-            raise HTTPException(status_code=404, detail="New dog not found or access denied")
-        db_medicine_event.dog_id = medicine_event_update.dog_id
-
-    # If changing the medicine_id, verify the new medicine also belongs to the user
-    if medicine_event_update.medicine_id is not None and medicine_event_update.medicine_id != db_medicine_event.medicine_id:
-        new_medicine = db.query(DBMedicine).filter(
-            DBMedicine.id == medicine_event_update.medicine_id,
-            DBMedicine.user_id == current_user.id
-        ).first()
-        if not new_medicine:
-            raise HTTPException(status_code=404, detail="New medicine not found or access denied")
-        db_medicine_event.medicine_id = medicine_event_update.medicine_id
-
     # Update only provided fields
-    if medicine_event_update.date is not None:
-        db_medicine_event.date = medicine_event_update.date
-    if medicine_event_update.time_of_day is not None:
-        db_medicine_event.time_of_day = medicine_event_update.time_of_day
-    if medicine_event_update.dosage is not None:
-        db_medicine_event.dosage = medicine_event_update.dosage
-    if medicine_event_update.notes is not None:
-        db_medicine_event.notes = medicine_event_update.notes
-
-    db.commit()
-    db.refresh(db_medicine_event)
+    values = medicine_event_update.model_dump(exclude_none=True)
+
+    # A new dog or medicine must also belong to the user; checked in the same query as the event
+    references = []
+    if "dog_id" in values:
+        references.append(Reference("dog_id", DBDog, values["dog_id"], "New dog not found or access denied"))
+    if "medicine_id" in values:
+        references.append(Reference(
+            "medicine_id", DBMedicine, values["medicine_id"], "New medicine not found or access denied"
+        ))
+    before = await fetch_owned(
+        db, DBMedicineEvent, medicine_event_id, current_user.id, "Medicine event not found", references
+    )
+    if not values:
+        return before
+
+    db_medicine_event = await update_owned(db, DBMedicineEvent, medicine_event_id, values)
+    await track_dose(db, snapshot(before), snapshot(db_medicine_event))
+    await db.commit()
+    publish_change(current_user.id, "medicine_event", db_medicine_event.id, "update")
     return db_medicine_event
 
 
@@ -158,23 +133,14 @@ async def update_medicine_event(
 async def delete_medicine_event(
     medicine_event_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a medicine event"""
-    db_medicine_event = db.query(DBMedicineEvent).filter(DBMedicineEvent.id == medicine_event_id).first()
-
-    if not db_medicine_event:
-        raise HTTPException(status_code=404, detail="Medicine event not found")
-
-    # Verify the medicine event's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == db_medicine_event.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    db.delete(db_medicine_event)
-    db.commit()
+    db_medicine_event = await delete_owned(
+        db, DBMedicineEvent, medicine_event_id, current_user.id, "Medicine event not found"
+    )
+    await record_deletion(db, current_user.id, "medicine_event", db_medicine_event.id)
+    await track_dose(db, snapshot(db_medicine_event), None)
+    await db.commit()
+    publish_change(current_user.id, "medicine_event", db_medicine_event.id, "delete")
     return None
@@ -1,29 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db, DBMedicine, DBUser
 from app.models import Medicine, MedicineCreate, MedicineUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.changes import publish_change, conditional_get
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.response_cache import CachedResponse, cached_list
+from app.services.stock import set_stock
+from datetime import datetime
 import uuid
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[Medicine])
+@router.get("", response_model=List[Medicine], dependencies=[Depends(conditional_get)])
 async def get_medicines(
+    response: Response,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    fields: FieldSet = Depends(field_set(Medicine, DBMedicine)),
+    cached: CachedResponse = Depends(cached_list("medicines"))
 ):
-    """Get all medicines for the current user"""
-    medicines = db.query(DBMedicine).filter(DBMedicine.user_id == current_user.id).all()
-    return medicines
+    """Get all medicines for the current user; fields=id,name,... returns only those keys"""
+    hit = cached.lookup(response)
+    if hit is not None:
+        return hit
+    rows = (await db.execute(fields.select().where(DBMedicine.user_id == current_user.id))).all()
+    return cached.store(json_rows(rows, fields, response))
 
 
 @router.post("", response_model=Medicine, status_code=201)
 async def create_medicine(
     medicine: MedicineCreate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new medicine for the current user"""
     db_medicine = DBMedicine(
@@ -31,11 +44,16 @@ async def create_medicine(
         user_id=current_user.id,
         name=medicine.name,
         type=medicine.type,
-        description=medicine.description
+        description=medicine.description,
+        pack_size=medicine.pack_size
     )
+    if medicine.stock_on_hand is not None:
+        db_medicine.stock_on_hand = medicine.stock_on_hand
+        db_medicine.stock_updated_at = datetime.now()
     db.add(db_medicine)
-    db.commit()
-    db.refresh(db_medicine)
+    await db.commit()
+    publish_change(current_user.id, "medicine", db_medicine.id, "create")
+    await db.refresh(db_medicine)
     return db_medicine
 
 
@@ -43,13 +61,13 @@ async def create_medicine(
 async def get_medicine(
     medicine_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific medicine by ID"""
-    medicine = db.query(DBMedicine).filter(
+    medicine = await db.scalar(select(DBMedicine).where(
         DBMedicine.id == medicine_id,
         DBMedicine.user_id == current_user.id
-    ).first()
+    ))
 
     if not medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
@@ -62,13 +80,13 @@ async def update_medicine(
     medicine_id: str,
     medicine_update: MedicineUpdate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a medicine's information"""
-    db_medicine = db.query(DBMedicine).filter(
+    db_medicine = await db.scalar(select(DBMedicine).where(
         DBMedicine.id == medicine_id,
         DBMedicine.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
@@ -80,9 +98,14 @@ async def update_medicine(
         db_medicine.type = medicine_update.type
     if medicine_update.description is not None:
         db_medicine.description = medicine_update.description
-
-    db.commit()
-    db.refresh(db_medicine)
+    if medicine_update.pack_size is not None:
+        db_medicine.pack_size = medicine_update.pack_size
+    if medicine_update.stock_on_hand is not None:
+        await set_stock(db, db_medicine, medicine_update.stock_on_hand)
+
+    await db.commit()
+    publish_change(current_user.id, "medicine", db_medicine.id, "update")
+    await db.refresh(db_medicine)
     return db_medicine
 
 
@@ -90,17 +113,19 @@ async def update_medicine(
 async def delete_medicine(
     medicine_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a medicine (and all associated medicine events)"""
-    db_medicine = db.query(DBMedicine).filter(
+    db_medicine = await db.scalar(select(DBMedicine).where(
         DBMedicine.id == medicine_id,
         DBMedicine.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
 
-    db.delete(db_medicine)
-    db.commit()
+    await record_deletion(db, current_user.id, "medicine", db_medicine.id)
+    await db.delete(db_medicine)
+    await db.commit()
+    publish_change(current_user.id, "medicine", db_medicine.id, "delete")
     return None
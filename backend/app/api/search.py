@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from app.database import get_db, DBUser
+from app.models import SearchResponse
+from app.api.auth import get_current_user
+from app.services.search import search as search_records
+
+router = APIRouter()
+
+SearchType = Literal["event", "vet_visit", "medicine_event", "vet", "medicine"]
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; the last one may be a prefix"),
+    limit: int = Query(20, ge=1, le=100),
+    type: Optional[List[SearchType]] = Query(None, description="Only these record types"),
+    dog_id: Optional[List[str]] = Query(None, description="Only records of these dogs"),
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search the notes of events, vet visits and medicine events, and vet
+    and medicine names, notes and descriptions
+
+    Results are the current user's only, best match first, each with a
+    highlighted snippet.
+    """
+    items = await search_records(db, current_user.id, q, limit, types=type, dog_ids=dog_id)
+    return SearchResponse(items=items)
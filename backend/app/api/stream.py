@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional
+from app.database import get_db, DBUser
+from app.api.auth import get_current_user
+from app.services.changes import change_sequence, stream_event_id
+from app.services.stream import (
+    RESYNC, STREAM_HEARTBEAT_SECONDS, STREAM_RETRY_MILLISECONDS,
+    change_hub, sse_frame
+)
+import asyncio
+
+router = APIRouter()
+
+HEARTBEAT = b": ping\n\n"
+
+
+def _resync(user_id: str) -> bytes:
+    version = change_sequence.get(user_id)
+    return sse_frame("resync", {"version": version}, stream_event_id(version))
+
+
+def _opening(user_id: str, last_event_id: Optional[str]) -> bytes:
+    version = change_sequence.get(user_id)
+    event_id = stream_event_id(version)
+    if last_event_id is not None and last_event_id != event_id:
+        frame = _resync(user_id)
+    else:
+        frame = sse_frame("ready", {"version": version}, event_id)
+    return f"retry: {STREAM_RETRY_MILLISECONDS}\n".encode() + frame
+
+
+async def _frames(user_id: str, last_event_id: Optional[str]) -> AsyncIterator[bytes]:
+    # Subscribe inside the generator so the finally below always runs, and
+    # read the version in the same step so no change falls in between
+    subscription = change_hub.subscribe(user_id)
+    try:
+        yield _opening(user_id, last_event_id)
+        while True:
+            try:
+                item = await subscription.next(STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream and surfaces dead peers
+                yield HEARTBEAT
+                continue
+            yield _resync(user_id) if item is RESYNC else item
+    finally:
+        change_hub.unsubscribe(subscription)
+
+
+@router.get("")
+async def stream_changes(
+    last_event_id: Optional[str] = Header(None),
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Server-Sent Events feed of changes to the current user's data
+
+    Each committed mutation arrives as an event named change with data
+    {"type", "id", "op", "version"} (id is null for bulk imports) and the
+    version as the event ID. A new stream opens with a ready event
+    carrying the current version. A reconnect whose Last-Event-ID is not
+    the current version, or a stream that fell too far behind, gets a
+    resync event instead: the client should refetch what it shows.
+    Comment lines are sent as a heartbeat while idle.
+
+    Authenticates with the Authorization header like every other
+    endpoint, so browsers read it with fetch rather than EventSource.
+    """
+    # Return the pooled connection now rather than when the stream ends
+    await db.close()
+    return StreamingResponse(
+        _frames(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx buffers proxied responses by default
+            "X-Accel-Buffering": "no",
+        }
+    )
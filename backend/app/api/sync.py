@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime
+from app.database import (
+    get_db, DBUser, DBDog, DBVet, DBMedicine, DBCustomEvent,
+    DBEvent, DBVetVisit, DBMedicineEvent, DBTombstone
+)
+from app.models import SyncResponse, Tombstone
+from app.api.auth import get_current_user
+from app.services.sync import make_token, parse_token
+
+router = APIRouter()
+
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = None,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get everything that changed since a sync token
+
+    Without a token (or with one older than the tombstone retention
+    window) this is a full sync and full is true. Otherwise only rows
+    updated since the token are returned, plus tombstones for deleted
+    records. Store the returned token for the next call. Rows may repeat
+    across calls and must be applied as upserts.
+    """
+    as_of = datetime.now()
+    position = parse_token(since)
+
+    async def changed(model, owner_clause):
+        query = select(model).where(owner_clause)
+        if position:
+            query = query.where(model.updated_at > position[0])
+        return (await db.scalars(query)).all()
+
+    # Read the tombstone position first so deletions committed mid-sync are picked up next time
+    last_tombstone_id = await db.scalar(
+        select(func.coalesce(func.max(DBTombstone.id), 0)).where(DBTombstone.user_id == current_user.id)
+    )
+
+    deleted = []
+    if position:
+        tombstones = (await db.scalars(
+            select(DBTombstone).where(
+                DBTombstone.user_id == current_user.id,
+                DBTombstone.id > position[1],
+                DBTombstone.id <= last_tombstone_id
+            ).order_by(DBTombstone.id)
+        )).all()
+        deleted = [Tombstone(type=t.entity_type, id=t.entity_id, deleted_at=t.deleted_at) for t in tombstones]
+
+    return SyncResponse(
+        token=make_token(as_of, last_tombstone_id),
+        full=position is None,
+        dogs=await changed(DBDog, DBDog.user_id == current_user.id),
+        vets=await changed(DBVet, DBVet.user_id == current_user.id),
+        medicines=await changed(DBMedicine, DBMedicine.user_id == current_user.id),
+        custom_events=await changed(DBCustomEvent, DBCustomEvent.user_id == current_user.id),
+        events=await changed(DBEvent, DBEvent.user_id == current_user.id),
+        vet_visits=await changed(DBVetVisit, DBVetVisit.user_id == current_user.id),
+        medicine_events=await changed(DBMedicineEvent, DBMedicineEvent.user_id == current_user.id),
+        deleted=deleted
+    )
@@ -0,0 +1,130 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, union_all, literal, null, case, and_, or_, false
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional, Literal, get_args
+from app.database import get_db, DBUser, DBDog, DBEvent, DBVetVisit, DBMedicineEvent, TimeOfDay
+from app.models import TimelineItem, TimelinePage
+from app.api.auth import get_current_user
+from app.services.filters import EventFilter, TimelineFilter, event_filter
+from app.services.changes import conditional_get
+from app.services.ownership import owned_ids
+from app.services.serialization import FieldSet, field_set, json_response
+from app.services.pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter()
+
+TimelineKind = Literal["event", "vet_visit", "medicine_event"]
+
+# Columns every branch selects whatever fields were requested
+SORT_KEYS = ("date", "time_rank", "kind", "id")
+
+# Within a day, entries are listed morning first
+TIME_OF_DAY_RANK = {
+    TimeOfDay.MORNING: 0,
+    TimeOfDay.AFTERNOON: 1,
+    TimeOfDay.EVENING: 2,
+    TimeOfDay.OVERNIGHT: 3,
+}
+
+
+def _branch(kind: str, model, clauses: list, cursor: Optional[list], limit: int, names: tuple):
+    """
+    Build one UNION ALL branch, already filtered, ordered and limited
+
+    The timeline order is (date DESC, time-of-day rank, kind, id). Each
+    branch is sorted the same way and cut at limit + 1 rows, so the merged
+    page only ever looks at 3 * (limit + 1) rows however long the history.
+    """
+    # Comparisons (rather than case(value=...)) bind through the column's Enum type
+    rank = case(*((model.time_of_day == tod, r) for tod, r in TIME_OF_DAY_RANK.items()))
+    columns = {
+        "kind": literal(kind),
+        "id": model.id,
+        "dog_id": model.dog_id,
+        "date": model.date,
+        "time_of_day": model.time_of_day,
+        "time_rank": rank,
+        "event_type": model.event_type if model is DBEvent else null(),
+        "custom_event_id": model.custom_event_id if model is DBEvent else null(),
+        "poo_quality": model.poo_quality if model is DBEvent else null(),
+        "vomit_quality": model.vomit_quality if model is DBEvent else null(),
+        "vet_id": model.vet_id if model is DBVetVisit else null(),
+        "medicine_id": model.medicine_id if model is DBMedicineEvent else null(),
+        "dosage": model.dosage if model is DBMedicineEvent else null(),
+        "notes": model.notes,
+        "created_at": model.created_at,
+        "updated_at": model.updated_at,
+    }
+    # The requested fields first, then what ordering and the cursor need
+    query = select(*(columns[name].label(name) for name in dict.fromkeys(names + SORT_KEYS))).where(*clauses)
+
+    if cursor:
+        date, time_rank, cursor_kind, record_id = cursor
+        # kind is constant per branch, so the tie-break on it is resolved here
+        if kind > cursor_kind:
+            same_rank = True
+        elif kind == cursor_kind:
+            same_rank = model.id > record_id
+        else:
+            same_rank = false()
+        query = query.where(
+            model.date <= date,
+            or_(
+                model.date < date,
+                and_(model.date == date, rank > time_rank),
+                and_(model.date == date, rank == time_rank, same_rank),
+            )
+        )
+
+    return query.order_by(model.date.desc(), rank, model.id).limit(limit + 1).subquery()
+
+
+@router.get("", response_model=TimelinePage, dependencies=[Depends(conditional_get)])
+async def get_timeline(
+    response: Response,
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    filters: EventFilter = Depends(event_filter),
+    fields: FieldSet = Depends(field_set(TimelineItem)),
+    kind: Optional[List[TimelineKind]] = Query(None, description="Only these record types"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """
+    Get one page of the merged timeline of events, vet visits and medicine events
+
+    Ordered by date (newest first), then time of day, then record type.
+    Event-specific filters (event_type, custom_event_id, poo_quality) only
+    narrow the events; use kind to leave out whole record types. Pass
+    next_cursor back as cursor to fetch the following page.
+    fields=kind,id,date,... returns only those keys of each item.
+    """
+    filters.check_dogs(await owned_ids(db, DBDog, filters.dog_ids, current_user.id))
+
+    decoded = decode_cursor(cursor, (datetime, int, str, str)) if cursor else None
+    # The kind is compared against each branch's constant, so it must be one of them
+    if decoded and decoded[2] not in get_args(TimelineKind):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    kinds = set(kind) if kind else {"event", "vet_visit", "medicine_event"}
+
+    branches = []
+    for branch_kind, model in (("event", DBEvent), ("vet_visit", DBVetVisit), ("medicine_event", DBMedicineEvent)):
+        if branch_kind not in kinds:
+            continue
+        # The subclass compile adds the event-only clauses; other types get the shared ones
+        clauses = filters.compile(model) if model is DBEvent else TimelineFilter.compile(filters, model)
+        clauses.append(model.user_id == current_user.id)
+        branches.append(select(_branch(branch_kind, model, clauses, decoded, limit, fields.names)))
+
+    merged = union_all(*branches).subquery() if len(branches) > 1 else branches[0].subquery()
+    query = select(merged).order_by(merged.c.date.desc(), merged.c.time_rank, merged.c.kind, merged.c.id).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date, last.time_rank, last.kind, last.id)
+
+    return json_response({"items": fields.project(rows), "next_cursor": next_cursor}, response)
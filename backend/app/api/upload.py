@@ -2,6 +2,7 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from app.models import UploadResponse
 from app.api.auth import get_current_user
 from app.database import DBUser
+from app.services.executor import run_blocking
 import base64
 from PIL import Image
 import io
@@ -15,6 +16,30 @@ ALLOWED_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 MAX_FILE_SIZE = 2 * 1024 * 1024
 
 
+def encode_image(contents: bytes, content_type: str) -> str:
+    """
+    Validate image bytes and encode them as a base64 data URI
+
+    Runs on the blocking executor since PIL decoding and base64
+    encoding of a 2MB file are CPU-bound.
+
+    Raises:
+        ValueError: If the bytes are not a valid image
+    """
+    # Validate it's a real image by trying to open with PIL
+    try:
+        image = Image.open(io.BytesIO(contents))
+        image.verify()
+    except Exception:
+        raise ValueError("Invalid image file")
+
+    # Convert to base64
+    base64_data = base64.b64encode(contents).decode('utf-8')
+
+    # Return with proper data URI format
+    return f"data:{content_type};base64,{base64_data}"
+
+
 @router.post("/image", response_model=UploadResponse)
 async def upload_image(
     file: UploadFile = File(...),
@@ -45,20 +70,12 @@ async def upload_image(
             detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB"
         )
 
-    # Validate it's a real image by trying to open with PIL
     try:
-        image = Image.open(io.BytesIO(contents))
-        image.verify()
-    except Exception:
+        data_uri = await run_blocking(encode_image, contents, file.content_type)
+    except ValueError as e:
         raise HTTPException(
             status_code=400,
-            detail="Invalid image file"
+            detail=str(e)
         )
 
-    # Convert to base64
-    base64_data = base64.b64encode(contents).decode('utf-8')
-
-    # Return with proper data URI format
-    data_uri = f"data:{file.content_type};base64,{base64_data}"
-
     return UploadResponse(data=data_uri)
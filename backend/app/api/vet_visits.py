@@ -1,74 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database import get_db, DBVetVisit, DBUser, DBDog, DBVet
 from app.models import VetVisit, VetVisitCreate, VetVisitUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.changes import publish_change, conditional_get
+from app.services.ownership import Reference, owned_ids, check_references, fetch_owned, update_owned, delete_owned
+from app.services.filters import VetVisitFilter, vet_visit_filter
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.pagination import keyset_paginate, page_results, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 import uuid
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[VetVisit])
+@router.get("", response_model=List[VetVisit], dependencies=[Depends(conditional_get)])
 async def get_vet_visits(
+    response: Response,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    dog_id: str = None
+    db: AsyncSession = Depends(get_db),
+    filters: VetVisitFilter = Depends(vet_visit_filter),
+    fields: FieldSet = Depends(field_set(VetVisit, DBVetVisit)),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    unpaginated: bool = Query(False, alias="all")
 ):
-    """Get all vet visits for the current user, optionally filtered by dog_id"""
-    # Get all dog IDs that belong to the current user
-    user_dog_ids = [dog.id for dog in db.query(DBDog).filter(DBDog.user_id == current_user.id).all()]
+    """
+    Get vet visits for the current user, newest first, optionally filtered
 
-    # Build query to get vet visits only for user's dogs
-    query = db.query(DBVetVisit).filter(DBVetVisit.dog_id.in_(user_dog_ids))
+    Results are paginated by (date, id): pass the X-Next-Cursor response
+    header back as cursor to fetch the next page. all=true returns the
+    full history in one response. fields=id,date,... returns only those
+    keys.
+    """
+    # Requested dogs must be the user's; only they are looked up
+    filters.check_dogs(await owned_ids(db, DBDog, filters.dog_ids, current_user.id))
 
-    # Optional filter by specific dog
-    if dog_id:
-        if dog_id not in user_dog_ids:
-            raise HTTPException(status_code=403, detail="Access denied to this dog")
-        query = query.filter(DBVetVisit.dog_id == dog_id)
+    # Build query to get the user's vet visits from the (user_id, date) index,
+    # selecting just the requested fields (plus the cursor's) so no ORM
+    # objects are built
+    query = fields.select("date", "id").where(DBVetVisit.user_id == current_user.id)
+
+    # Optional filters (dogs, date range, time of day, ...)
+    query = query.where(*filters.compile(DBVetVisit))
 
     # Order by date descending (most recent first)
-    vet_visits = query.order_by(DBVetVisit.date.desc()).all()
-    return vet_visits
+    if unpaginated:
+        return json_rows((await db.execute(query.order_by(DBVetVisit.date.desc(), DBVetVisit.id.desc()))).all(), fields, response)
+
+    rows = (await db.execute(keyset_paginate(query, DBVetVisit, cursor, limit))).all()
+    vet_visits, next_cursor = page_results(rows, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_rows(vet_visits, fields, response)
 
 
 @router.post("", response_model=VetVisit, status_code=201)
 async def create_vet_visit(
     vet_visit: VetVisitCreate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new vet visit record"""
-    # Verify the dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == vet_visit.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=404, detail="Dog not found or access denied")
-
-    # Verify the vet belongs to the current user
-    vet = db.query(DBVet).filter(
-        DBVet.id == vet_visit.vet_id,
-        DBVet.user_id == current_user.id
-    ).first()
-
-    if not vet:
-        raise HTTPException(status_code=404, detail="Vet not found or access denied")
+    # Verify the dog and the vet belong to the current user
+    await check_references(db, current_user.id, [
+        Reference("dog_id", DBDog, vet_visit.dog_id, "Dog not found or access denied"),
+        Reference("vet_id", DBVet, vet_visit.vet_id, "Vet not found or access denied"),
+    ])
 
     db_vet_visit = DBVetVisit(
         id=str(uuid.uuid4()),
         dog_id=vet_visit.dog_id,
+        user_id=current_user.id,
         vet_id=vet_visit.vet_id,
         date=vet_visit.date,
         time_of_day=vet_visit.time_of_day,
         notes=vet_visit.notes
     )
     db.add(db_vet_visit)
-    db.commit()
-    db.refresh(db_vet_visit)
+    await db.commit()
+    publish_change(current_user.id, "vet_visit", db_vet_visit.id, "create")
     return db_vet_visit
 
 
@@ -76,24 +88,10 @@ async def create_vet_visit(
 async def get_vet_visit(
     vet_visit_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific vet visit by ID"""
-    vet_visit = db.query(DBVetVisit).filter(DBVetVisit.id == vet_visit_id).first()
-
-    if not vet_visit:
-        raise HTTPException(status_code=404, detail="Vet visit not found")
-
-    # Verify the vet visit's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == vet_visit.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    return vet_visit
+    return await fetch_owned(db, DBVetVisit, vet_visit_id, current_user.id, "Vet visit not found")
 
 
 @router.put("/{vet_visit_id}", response_model=VetVisit)
@@ -101,53 +99,25 @@ async def update_vet_visit(
     vet_visit_id: str,
     vet_visit_update: VetVisitUpdate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a vet visit's information"""
-    db_vet_visit = db.query(DBVetVisit).filter(DBVetVisit.id == vet_visit_id).first()
-
-    if not db_vet_visit:
-        raise HTTPException(status_code=404, detail="Vet visit not found")
-
-    # Verify the vet visit's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == db_vet_visit.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # If changing the dog_id, verify the new dog also belongs to the user
-    if vet_visit_update.dog_id is not None and vet_visit_update.dog_id != db_vet_visit.dog_id:
-        new_dog = db.query(DBDog).filter(
-            DBDog.id == vet_visit_update.dog_id,
-            DBDog.user_id == current_user.id
-        ).first()
-        if not new_dog:
-            raise HTTPException(status_code=404, detail="New dog not found or access denied")
-        db_vet_visit.dog_id = vet_visit_update.dog_id
-
-    # If changing the vet_id, verify the new vet also belongs to the user
-    if vet_visit_update.vet_id is not None and vet_visit_update.vet_id != db_vet_visit.vet_id:
-        new_vet = db.query(DBVet).filter(
-            DBVet.id == vet_visit_update.vet_id,
-            DBVet.user_id == current_user.id
-        ).first()
-        if not new_vet:
-            raise HTTPException(status_code=404, detail="New vet not found or access denied")
-        db_vet_visit.vet_id = vet_visit_update.vet_id
-
     # Update only provided fields
-    if vet_visit_update.date is not None:
-        db_vet_visit.date = vet_visit_update.date
-    if vet_visit_update.time_of_day is not None:
-        db_vet_visit.time_of_day = vet_visit_update.time_of_day
-    if vet_visit_update.notes is not None:
-        db_vet_visit.notes = vet_visit_update.notes
-
-    db.commit()
-    db.refresh(db_vet_visit)
+    values = vet_visit_update.model_dump(exclude_none=True)
+
+    # A new dog or vet must also belong to the user; checked in the same query as the visit
+    references = []
+    if "dog_id" in values:
+        references.append(Reference("dog_id", DBDog, values["dog_id"], "New dog not found or access denied"))
+    if "vet_id" in values:
+        references.append(Reference("vet_id", DBVet, values["vet_id"], "New vet not found or access denied"))
+    before = await fetch_owned(db, DBVetVisit, vet_visit_id, current_user.id, "Vet visit not found", references)
+    if not values:
+        return before
+
+    db_vet_visit = await update_owned(db, DBVetVisit, vet_visit_id, values)
+    await db.commit()
+    publish_change(current_user.id, "vet_visit", db_vet_visit.id, "update")
     return db_vet_visit
 
 
@@ -155,23 +125,11 @@ async def update_vet_visit(
 async def delete_vet_visit(
     vet_visit_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a vet visit"""
-    db_vet_visit = db.query(DBVetVisit).filter(DBVetVisit.id == vet_visit_id).first()
-
-    if not db_vet_visit:
-        raise HTTPException(status_code=404, detail="Vet visit not found")
-
-    # Verify the vet visit's dog belongs to the current user
-    dog = db.query(DBDog).filter(
-        DBDog.id == db_vet_visit.dog_id,
-        DBDog.user_id == current_user.id
-    ).first()
-
-    if not dog:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    db.delete(db_vet_visit)
-    db.commit()
+    db_vet_visit = await delete_owned(db, DBVetVisit, vet_visit_id, current_user.id, "Vet visit not found")
+    await record_deletion(db, current_user.id, "vet_visit", db_vet_visit.id)
+    await db.commit()
+    publish_change(current_user.id, "vet_visit", db_vet_visit.id, "delete")
     return None
@@ -1,29 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db, DBVet, DBUser
 from app.models import Vet, VetCreate, VetUpdate
 from app.api.auth import get_current_user
+from app.services.sync import record_deletion
+from app.services.changes import publish_change, conditional_get
+from app.services.ownership import update_owned
+from app.services.serialization import FieldSet, field_set, json_rows
+from app.services.response_cache import CachedResponse, cached_list
 import uuid
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[Vet])
+@router.get("", response_model=List[Vet], dependencies=[Depends(conditional_get)])
 async def get_vets(
+    response: Response,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    fields: FieldSet = Depends(field_set(Vet, DBVet)),
+    cached: CachedResponse = Depends(cached_list("vets"))
 ):
-    """Get all vets for the current user"""
-    vets = db.query(DBVet).filter(DBVet.user_id == current_user.id).all()
-    return vets
+    """Get all vets for the current user; fields=id,name,... returns only those keys"""
+    hit = cached.lookup(response)
+    if hit is not None:
+        return hit
+    rows = (await db.execute(fields.select().where(DBVet.user_id == current_user.id))).all()
+    return cached.store(json_rows(rows, fields, response))
 
 
 @router.post("", response_model=Vet, status_code=201)
 async def create_vet(
     vet: VetCreate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new vet for the current user"""
     db_vet = DBVet(
@@ -34,8 +46,8 @@ async def create_vet(
         notes=vet.notes
     )
     db.add(db_vet)
-    db.commit()
-    db.refresh(db_vet)
+    await db.commit()
+    publish_change(current_user.id, "vet", db_vet.id, "create")
     return db_vet
 
 
@@ -43,13 +55,13 @@ async def create_vet(
 async def get_vet(
     vet_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific vet by ID"""
-    vet = db.query(DBVet).filter(
+    vet = await db.scalar(select(DBVet).where(
         DBVet.id == vet_id,
         DBVet.user_id == current_user.id
-    ).first()
+    ))
 
     if not vet:
         raise HTTPException(status_code=404, detail="Vet not found")
@@ -62,27 +74,17 @@ async def update_vet(
     vet_id: str,
     vet_update: VetUpdate,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a vet's information"""
-    db_vet = db.query(DBVet).filter(
-        DBVet.id == vet_id,
-        DBVet.user_id == current_user.id
-    ).first()
+    # Update only provided fields, in one UPDATE ... RETURNING scoped to the user
+    db_vet = await update_owned(db, DBVet, vet_id, vet_update.model_dump(exclude_none=True), current_user.id)
 
     if not db_vet:
         raise HTTPException(status_code=404, detail="Vet not found")
 
-    # Update only provided fields
-    if vet_update.name is not None:
-        db_vet.name = vet_update.name
-    if vet_update.contact_info is not None:
-        db_vet.contact_info = vet_update.contact_info
-    if vet_update.notes is not None:
-        db_vet.notes = vet_update.notes
-
-    db.commit()
-    db.refresh(db_vet)
+    await db.commit()
+    publish_change(current_user.id, "vet", db_vet.id, "update")
     return db_vet
 
 
@@ -90,17 +92,19 @@ async def update_vet(
 async def delete_vet(
     vet_id: str,
     current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a vet (and all associated vet visits)"""
-    db_vet = db.query(DBVet).filter(
+    db_vet = await db.scalar(select(DBVet).where(
         DBVet.id == vet_id,
         DBVet.user_id == current_user.id
-    ).first()
+    ))
 
     if not db_vet:
         raise HTTPException(status_code=404, detail="Vet not found")
 
-    db.delete(db_vet)
-    db.commit()
+    await record_deletion(db, current_user.id, "vet", db_vet.id)
+    await db.delete(db_vet)
+    await db.commit()
+    publish_change(current_user.id, "vet", db_vet.id, "delete")
     return None
@@ -0,0 +1,152 @@
+"""
+Command-line maintenance tasks
+
+Usage:
+    python -m app.cli migrate [--dry-run]
+    python -m app.cli prune-tombstones [--days N]
+    python -m app.cli rebuild-rollups [--dog ID ...]
+    python -m app.cli rebuild-stock [--medicine ID ...]
+    python -m app.cli backfill-search
+    python -m app.cli import FILE --user EMAIL [--format csv|ndjson] [--type TYPE] [--errors FILE]
+"""
+import argparse
+import json
+import sys
+
+from app.database import engine, Base, SessionLocal, DBUser
+from app import migrations
+from app.services.sync import prune_tombstones, TOMBSTONE_RETENTION_DAYS
+from app.services.rollups import rebuild_rollups
+from app.services.stock import rebuild_stock
+from app.services.search import backfill_search
+from app.services.importer import import_records, detect_format, FORMATS, RECORD_TYPES, IMPORT_CHUNK_SIZE
+
+
+def cmd_migrate(args: argparse.Namespace) -> int:
+    """Apply pending schema migrations, or show what they would change"""
+    if args.dry_run:
+        print(json.dumps(migrations.dry_run(engine), indent=2))
+        return 0
+
+    Base.metadata.create_all(bind=engine)
+    applied = migrations.run_migrations(engine)
+    for migration in applied:
+        print(f"Applied {migration.version}: {migration.description}")
+    with engine.connect() as conn:
+        print(f"Schema version: {migrations.get_schema_version(conn)}")
+    return 0
+
+
+def cmd_prune_tombstones(args: argparse.Namespace) -> int:
+    """Delete sync tombstones older than the retention window"""
+    db = SessionLocal()
+    try:
+        removed = prune_tombstones(db, args.days)
+    finally:
+        db.close()
+    print(f"Removed {removed} tombstones older than {args.days} days")
+    return 0
+
+
+def cmd_rebuild_rollups(args: argparse.Namespace) -> int:
+    """Recompute daily event rollups from the events table"""
+    with engine.begin() as conn:
+        written = rebuild_rollups(conn, args.dog)
+    scope = f"{len(args.dog)} dogs" if args.dog else "all dogs"
+    print(f"Wrote {written} rollup rows for {scope}")
+    return 0
+
+
+def cmd_rebuild_stock(args: argparse.Namespace) -> int:
+    """Recompute medicine dose totals and dosing rates from medicine events"""
+    with engine.begin() as conn:
+        updated = rebuild_stock(conn, args.medicine)
+    print(f"Updated stock totals for {updated} medicines")
+    return 0
+
+
+def cmd_backfill_search(args: argparse.Namespace) -> int:
+    """Rebuild the full-text search index from existing records"""
+    with engine.begin() as conn:
+        indexed = backfill_search(conn)
+    print(f"Indexed {indexed} documents")
+    return 0
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    """Bulk import records for a user from CSV or NDJSON"""
+    fmt = args.format or detect_format(args.file)
+    if fmt is None:
+        print("Cannot tell the file format from its name; pass --format", file=sys.stderr)
+        return 2
+
+    db = SessionLocal()
+    try:
+        user = db.query(DBUser).filter(DBUser.email == args.user).first()
+    finally:
+        db.close()
+    if not user:
+        print(f"No user with email {args.user}", file=sys.stderr)
+        return 1
+
+    def report(stats):
+        rate = stats.rows / stats.elapsed if stats.elapsed else 0
+        print(
+            f"{stats.rows} rows read, {sum(stats.inserted.values())} inserted, "
+            f"{stats.failed} rejected ({rate:,.0f} rows/s)",
+            file=sys.stderr
+        )
+
+    errors = open(args.errors, "w", encoding="utf-8") if args.errors else None
+    try:
+        with open(args.file, encoding="utf-8-sig", newline="") as stream:
+            stats = import_records(
+                engine, user.id, stream, fmt,
+                default_type=args.type, errors=errors, progress=report, chunk_size=args.chunk_size
+            )
+    finally:
+        if errors:
+            errors.close()
+
+    print(json.dumps(stats.to_dict(), indent=2))
+    return 1 if stats.failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Barkly maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="Apply pending schema migrations")
+    migrate.add_argument("--dry-run", action="store_true", help="Show pending steps and query plans without applying them")
+    migrate.set_defaults(func=cmd_migrate)
+
+    prune = subparsers.add_parser("prune-tombstones", help="Delete sync tombstones past the retention window")
+    prune.add_argument("--days", type=int, default=TOMBSTONE_RETENTION_DAYS, help="Retention window in days")
+    prune.set_defaults(func=cmd_prune_tombstones)
+
+    rollups = subparsers.add_parser("rebuild-rollups", help="Recompute daily event rollups")
+    rollups.add_argument("--dog", action="append", help="Only rebuild this dog (repeatable)")
+    rollups.set_defaults(func=cmd_rebuild_rollups)
+
+    stock = subparsers.add_parser("rebuild-stock", help="Recompute medicine dose totals and dosing rates")
+    stock.add_argument("--medicine", action="append", help="Only rebuild this medicine (repeatable)")
+    stock.set_defaults(func=cmd_rebuild_stock)
+
+    search = subparsers.add_parser("backfill-search", help="Rebuild the full-text search index")
+    search.set_defaults(func=cmd_backfill_search)
+
+    bulk = subparsers.add_parser("import", help="Bulk import events, vet visits and medicine events")
+    bulk.add_argument("file", help="CSV or NDJSON file")
+    bulk.add_argument("--user", required=True, help="Email of the user to import for")
+    bulk.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+    bulk.add_argument("--type", choices=list(RECORD_TYPES), help="Record type for rows without a type column")
+    bulk.add_argument("--errors", help="Write rejected rows to this NDJSON file")
+    bulk.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows per insert batch")
+    bulk.set_defaults(func=cmd_import)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
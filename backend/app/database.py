@@ -1,18 +1,102 @@
-from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import create_engine, event, Column, String, Integer, Float, Date, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from datetime import datetime
 import os
 import enum
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./barkly.db")
+# Async driver URL used by the API; defaults to DATABASE_URL with the aiosqlite driver
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# SQLite performance profiles, selected with SQLITE_PROFILE
+SQLITE_PROFILES = {
+    # WAL with a full fsync on every commit: no committed transaction is lost on power failure
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -16000,  # Negative values are KiB, so ~16MB
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    # WAL with fsync only at checkpoints: still crash-safe, may lose the last commits on power failure
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -32000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # No fsync at all: fastest, but an OS crash can corrupt the database
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "balanced")
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(f"Unknown SQLITE_PROFILE '{SQLITE_PROFILE}'. Choose from: {', '.join(SQLITE_PROFILES)}")
+
+# Individual PRAGMAs can be overridden, e.g. SQLITE_BUSY_TIMEOUT=10000
+SQLITE_PRAGMAS = {
+    name: os.getenv(f"SQLITE_{name.upper()}", value)
+    for name, value in SQLITE_PROFILES[SQLITE_PROFILE].items()
+}
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 )
 
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the configured PRAGMAs to every new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+# Async engine for the route handlers; the sync engine above serves
+# startup migrations and command-line tasks
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"check_same_thread": False} if ASYNC_DATABASE_URL.startswith("sqlite") else {}
+)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+
+async def get_sqlite_profile() -> dict:
+    """Return the active SQLite profile as reported by the database"""
+    if async_engine.dialect.name != "sqlite":
+        return {"profile": None}
+
+    async with async_engine.connect() as conn:
+        active = {}
+        for name in SQLITE_PRAGMAS:
+            active[name] = (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+    return {"profile": SQLITE_PROFILE, "pragmas": active}
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit without an implicit (awaitable) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -76,6 +160,11 @@ class DBDog(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Delta sync scans a user's rows changed since a point in time
+    __table_args__ = (
+        Index("ix_dogs_user_id_updated_at", user_id, updated_at),
+    )
+
     # Relationships
     user = relationship("DBUser", back_populates="dogs")
     events = relationship("DBEvent", back_populates="dog", cascade="all, delete-orphan")
@@ -95,6 +184,11 @@ class DBVet(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Delta sync scans a user's rows changed since a point in time
+    __table_args__ = (
+        Index("ix_vets_user_id_updated_at", user_id, updated_at),
+    )
+
     # Relationships
     user = relationship("DBUser", back_populates="vets")
     vet_visits = relationship("DBVetVisit", back_populates="vet", cascade="all, delete-orphan")
@@ -109,9 +203,44 @@ class DBMedicine(Base):
     name = Column(String, nullable=False)
     type = Column(SQLEnum(MedicineType), nullable=False)
     description = Column(Text, nullable=True)
+
+    # Stock tracking (optional); the totals are maintained by app.services.stock
+    stock_on_hand = Column(Float, nullable=True)  # Units counted at stock_updated_at
+    pack_size = Column(Float, nullable=True)  # Units per pack
+    stock_updated_at = Column(DateTime, nullable=True)
+    dosed_since_stock = Column(Float, nullable=False, default=0)  # Doses dated on or after the stock day
+    total_dosed = Column(Float, nullable=False, default=0)
+    # Units per day over the window ending on the last dose; daily_dose_rate below fades it with time
+    rate_at_last_dose = Column("daily_dose_rate", Float, nullable=False, default=0)
+    last_dosed_at = Column(DateTime, nullable=True)  # Date of the latest dose
+
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Delta sync scans a user's rows changed since a point in time
+    __table_args__ = (
+        Index("ix_medicines_user_id_updated_at", user_id, updated_at),
+    )
+
+    @property
+    def stock_remaining(self):
+        """Units left after the doses recorded since the stock count"""
+        if self.stock_on_hand is None:
+            return None
+        return max(self.stock_on_hand - (self.dosed_since_stock or 0), 0)
+
+    @property
+    def daily_dose_rate(self):
+        """Units per day over the recent window as of today"""
+        from app.services.stock import current_dose_rate
+        return current_dose_rate(self, datetime.now().date())
+
+    @property
+    def run_out_date(self):
+        """Forecast day the stock runs out at the recent dosing rate"""
+        from app.services.stock import forecast_run_out
+        return forecast_run_out(self, datetime.now().date())
+
     # Relationships
     user = relationship("DBUser", back_populates="medicines")
     medicine_events = relationship("DBMedicineEvent", back_populates="medicine", cascade="all, delete-orphan")
@@ -127,6 +256,11 @@ class DBCustomEvent(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Delta sync scans a user's rows changed since a point in time
+    __table_args__ = (
+        Index("ix_custom_events_user_id_updated_at", user_id, updated_at),
+    )
+
     # Relationships
     user = relationship("DBUser", back_populates="custom_events")
     events = relationship("DBEvent", back_populates="custom_event", cascade="all, delete-orphan")
@@ -138,6 +272,8 @@ class DBEvent(Base):
 
     id = Column(String, primary_key=True, index=True)
     dog_id = Column(String, ForeignKey("dogs.id"), nullable=False, index=True)
+    # Owner of the dog, copied on write so listing needs no join or dog lookup
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     event_type = Column(SQLEnum(EventType), nullable=True)  # Nullable for custom events
     custom_event_id = Column(String, ForeignKey("custom_events.id"), nullable=True, index=True)  # For custom events
     date = Column(DateTime, nullable=False, index=True)
@@ -153,6 +289,15 @@ class DBEvent(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Composite indexes for the timeline queries (by user or dog, newest first;
+    # id completes the keyset order so pages need no sort)
+    __table_args__ = (
+        Index("ix_events_user_id_date", user_id, date.desc(), id.desc()),
+        Index("ix_events_dog_id_date", dog_id, date.desc()),
+        # Delta sync: a user's rows changed since a point in time
+        Index("ix_events_user_id_updated_at", user_id, updated_at),
+    )
+
     # Relationships
     dog = relationship("DBDog", back_populates="events")
     custom_event = relationship("DBCustomEvent", back_populates="events")
@@ -164,6 +309,8 @@ class DBVetVisit(Base):
 
     id = Column(String, primary_key=True, index=True)
     dog_id = Column(String, ForeignKey("dogs.id"), nullable=False, index=True)
+    # Owner of the dog, copied on write so listing needs no join or dog lookup
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     vet_id = Column(String, ForeignKey("vets.id"), nullable=False, index=True)
     date = Column(DateTime, nullable=False, index=True)
     time_of_day = Column(SQLEnum(TimeOfDay), nullable=False)
@@ -171,6 +318,15 @@ class DBVetVisit(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Composite indexes for the timeline queries (by user or dog, newest first;
+    # id completes the keyset order so pages need no sort)
+    __table_args__ = (
+        Index("ix_vet_visits_user_id_date", user_id, date.desc(), id.desc()),
+        Index("ix_vet_visits_dog_id_date", dog_id, date.desc()),
+        # Delta sync: a user's rows changed since a point in time
+        Index("ix_vet_visits_user_id_updated_at", user_id, updated_at),
+    )
+
     # Relationships
     dog = relationship("DBDog", back_populates="vet_visits")
     vet = relationship("DBVet", back_populates="vet_visits")
@@ -182,6 +338,8 @@ class DBMedicineEvent(Base):
 
     id = Column(String, primary_key=True, index=True)
     dog_id = Column(String, ForeignKey("dogs.id"), nullable=False, index=True)
+    # Owner of the dog, copied on write so listing needs no join or dog lookup
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     medicine_id = Column(String, ForeignKey("medicines.id"), nullable=False, index=True)
     date = Column(DateTime, nullable=False, index=True)
     time_of_day = Column(SQLEnum(TimeOfDay), nullable=False)
@@ -190,20 +348,69 @@ class DBMedicineEvent(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
+    # Composite indexes for the timeline queries (by user or dog, newest first;
+    # id completes the keyset order so pages need no sort)
+    __table_args__ = (
+        Index("ix_medicine_events_user_id_date", user_id, date.desc(), id.desc()),
+        Index("ix_medicine_events_dog_id_date", dog_id, date.desc()),
+        # Stock totals and dosing rate per medicine
+        Index("ix_medicine_events_medicine_id_date", medicine_id, date),
+        # Delta sync: a user's rows changed since a point in time
+        Index("ix_medicine_events_user_id_updated_at", user_id, updated_at),
+    )
+
     # Relationships
     dog = relationship("DBDog", back_populates="medicine_events")
     medicine = relationship("DBMedicine", back_populates="medicine_events")
 
 
+class DBTombstone(Base):
+    """Tombstone model - records deletions so delta sync can report them"""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Monotonic, doubles as sync position
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    entity_type = Column(String, nullable=False)  # dog, vet, medicine, custom_event, event, vet_visit, medicine_event
+    entity_id = Column(String, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+    __table_args__ = (
+        Index("ix_tombstones_user_id_id", user_id, id),
+    )
+
+
+class DBEventRollup(Base):
+    """Event rollup model - per dog, per day totals of each event type"""
+    __tablename__ = "event_rollups"
+
+    dog_id = Column(String, ForeignKey("dogs.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    bucket = Column(String, primary_key=True)  # Event type name, or the custom event ID
+    event_type = Column(SQLEnum(EventType), nullable=True)
+    custom_event_id = Column(String, ForeignKey("custom_events.id"), nullable=True, index=True)
+    count = Column(Integer, nullable=False, default=0)
+    poo_quality_sum = Column(Integer, nullable=False, default=0)
+    poo_quality_count = Column(Integer, nullable=False, default=0)  # Events with a poo_quality
+
+
+class DBDataVersion(Base):
+    """Data version model - per user, per table write counter, bumped by triggers (see app.services.versions)"""
+    __tablename__ = "data_versions"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    source = Column(String, primary_key=True)  # Table whose rows were written
+    version = Column(Integer, nullable=False, default=0)
+
+
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and apply pending schema migrations"""
+    from app.migrations import run_migrations
+
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
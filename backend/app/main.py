@@ -1,13 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, dogs, vets, medicines, upload, events, vet_visits, medicine_events, custom_events
-from app.database import init_db
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.api import auth, dogs, vets, medicines, upload, events, vet_visits, medicine_events, custom_events, timeline, sync, batch, imports, export, analytics, search, stream
+from app.database import init_db, get_sqlite_profile
+from app.services.user_cache import user_cache
+from app.services.executor import blocking_executor, ExecutorSaturatedError
+from app.services.stream import change_hub
+from app.services.response_cache import response_cache
+from app.services.admission import AdmissionMiddleware, admission_controller
+from app.services.compression import CompressionMiddleware, compression_stats
 import os
 
 app = FastAPI(
     title="Barkly Backend API",
     description="Dog health tracking application API with Google OAuth authentication",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -16,12 +24,19 @@ ALLOWED_ORIGINS = os.getenv(
     "http://localhost:8080,http://localhost:8083"
 ).split(",")
 
+# Innermost, so rejected requests never reach it
+app.add_middleware(CompressionMiddleware)
+
+# Added before CORS so it runs inside it and its 429s still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
 # Include routers
@@ -33,7 +48,25 @@ app.include_router(custom_events.router, prefix="/api/custom-events", tags=["Cus
 app.include_router(events.router, prefix="/api/events", tags=["Events"])
 app.include_router(vet_visits.router, prefix="/api/vet-visits", tags=["Vet Visits"])
 app.include_router(medicine_events.router, prefix="/api/medicine-events", tags=["Medicine Events"])
+app.include_router(timeline.router, prefix="/api/timeline", tags=["Timeline"])
+app.include_router(sync.router, prefix="/api/sync", tags=["Sync"])
+app.include_router(batch.router, prefix="/api/batch", tags=["Batch"])
+app.include_router(imports.router, prefix="/api/import", tags=["Import"])
+app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
 app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
+app.include_router(stream.router, prefix="/api/stream", tags=["Stream"])
+
+
+@app.exception_handler(ExecutorSaturatedError)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturatedError):
+    """Shed load when the blocking executor's queue is full"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
 
 
 @app.on_event("startup")
@@ -42,6 +75,12 @@ async def startup_event():
     init_db()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Wait for in-flight blocking work to finish"""
+    blocking_executor.shutdown()
+
+
 @app.get("/")
 async def root():
     """API welcome message"""
@@ -55,4 +94,13 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "user_cache": user_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "blocking_executor": blocking_executor.stats(),
+        "change_stream": change_hub.stats(),
+        "admission": admission_controller.stats(),
+        "compression": compression_stats.stats(),
+        "sqlite": await get_sqlite_profile()
+    }
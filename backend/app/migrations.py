@@ -0,0 +1,249 @@
+"""
+Versioned schema migrations
+
+Base.metadata.create_all only creates missing tables, so indexes, columns
+and other schema objects added later never reach existing databases. Each
+Migration here is applied once, in version order, and recorded in the
+schema_migrations table. Steps must be idempotent (IF NOT EXISTS, column
+checks) because fresh databases already get the latest schema from
+create_all before the migrations run.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError, NoSuchTableError
+from sqlalchemy.engine import Connection, Engine
+from typing import Callable, Dict, List
+from datetime import datetime
+
+
+class Migration:
+    """A single schema migration step"""
+
+    def __init__(self, version: int, description: str, upgrade: Callable[[Connection], None]):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+
+def _create_timeline_indexes(conn: Connection) -> None:
+    for table in ("events", "vet_visits", "medicine_events"):
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_dog_id_date ON {table} (dog_id, date DESC)"
+        )
+
+
+def _create_sync_indexes(conn: Connection) -> None:
+    # The tombstones table itself is new, so create_all has already made it
+    for table in ("dogs", "vets", "medicines", "custom_events"):
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_user_id_updated_at ON {table} (user_id, updated_at)"
+        )
+    for table in ("events", "vet_visits", "medicine_events"):
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_dog_id_updated_at ON {table} (dog_id, updated_at)"
+        )
+
+
+def _backfill_event_rollups(conn: Connection) -> None:
+    # create_all makes the table on startup, but not before a dry run
+    from app.database import DBEventRollup
+    from app.services.rollups import rebuild_rollups
+    DBEventRollup.__table__.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+
+def _add_medicine_stock(conn: Connection) -> None:
+    from app.services.stock import rebuild_stock
+    columns = {
+        "stock_on_hand": "FLOAT",
+        "pack_size": "FLOAT",
+        "stock_updated_at": "DATETIME",
+        "dosed_since_stock": "FLOAT NOT NULL DEFAULT 0",
+        "total_dosed": "FLOAT NOT NULL DEFAULT 0",
+        "daily_dose_rate": "FLOAT NOT NULL DEFAULT 0",
+        # Added by migration 8, but rebuild_stock below already writes it
+        "last_dosed_at": "DATETIME",
+    }
+    for column, definition in columns.items():
+        if not column_exists(conn, "medicines", column):
+            conn.exec_driver_sql(f"ALTER TABLE medicines ADD COLUMN {column} {definition}")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_medicine_events_medicine_id_date ON medicine_events (medicine_id, date)"
+    )
+    rebuild_stock(conn)
+
+
+def _create_search_index(conn: Connection) -> None:
+    from app.services.search import backfill_search
+    backfill_search(conn)
+
+
+def _add_event_owner(conn: Connection) -> None:
+    for table in ("events", "vet_visits", "medicine_events"):
+        if not column_exists(conn, table, "user_id"):
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN user_id VARCHAR REFERENCES users (id)")
+        conn.exec_driver_sql(
+            f"UPDATE {table} SET user_id = (SELECT dogs.user_id FROM dogs WHERE dogs.id = {table}.dog_id) "
+            "WHERE user_id IS NULL"
+        )
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_user_id_date ON {table} (user_id, date DESC, id DESC)"
+        )
+        # Delta sync now scans by user instead of by dog
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_user_id_updated_at ON {table} (user_id, updated_at)"
+        )
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_dog_id_updated_at")
+
+
+def _add_last_dose(conn: Connection) -> None:
+    from app.services.stock import rebuild_stock
+    if not column_exists(conn, "medicines", "last_dosed_at"):
+        conn.exec_driver_sql("ALTER TABLE medicines ADD COLUMN last_dosed_at DATETIME")
+    # Re-anchor every rate on its medicine's last dose
+    rebuild_stock(conn)
+
+
+def _create_data_versions(conn: Connection) -> None:
+    from app.services.versions import install_version_triggers
+    install_version_triggers(conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Composite (dog_id, date DESC) indexes for timeline queries", _create_timeline_indexes),
+    Migration(2, "updated_at indexes for delta sync", _create_sync_indexes),
+    Migration(3, "Backfill daily event rollups", _backfill_event_rollups),
+    Migration(4, "Medicine stock columns, (medicine_id, date) index and dose totals", _add_medicine_stock),
+    Migration(5, "FTS5 search index over notes, kept current by triggers", _create_search_index),
+    Migration(6, "Owner user_id on events, vet visits and medicine events, with (user_id, date, id) indexes", _add_event_owner),
+    Migration(7, "Per-user data_versions table, bumped by triggers on every write", _create_data_versions),
+    Migration(8, "Medicine last_dosed_at, dosing rates anchored on the last dose", _add_last_dose),
+]
+
+# Representative list queries, used to show the query plan change in dry-run mode
+EXPLAIN_QUERIES: Dict[str, str] = {
+    table: f"SELECT * FROM {table} WHERE user_id = 'user' ORDER BY date DESC, id DESC"
+    for table in ("events", "vet_visits", "medicine_events")
+}
+
+# The same lists filtered by dog, as they were before the tables had user_id (migration 6)
+LEGACY_EXPLAIN_QUERIES: Dict[str, str] = {
+    table: f"SELECT * FROM {table} WHERE dog_id = 'dog' ORDER BY date DESC, id DESC"
+    for table in EXPLAIN_QUERIES
+}
+
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    """Check whether a column exists (for idempotent ADD COLUMN steps)"""
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description TEXT NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    )
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Return the highest applied migration version (0 if none)"""
+    _ensure_version_table(conn)
+    return conn.exec_driver_sql("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").scalar()
+
+
+def pending_migrations(conn: Connection) -> List[Migration]:
+    """Return migrations newer than the recorded schema version"""
+    current = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m.version > current]
+
+
+def explain(conn: Connection) -> Dict[str, List[str]]:
+    """
+    Return the query plan of each representative list query
+
+    Tables without user_id yet are explained with the dog_id query, so a
+    dry run on an older database still has a before plan to compare.
+    """
+    plans = {}
+    for table, query in EXPLAIN_QUERIES.items():
+        try:
+            if not column_exists(conn, table, "user_id"):
+                query = LEGACY_EXPLAIN_QUERIES[table]
+            if conn.dialect.name == "sqlite":
+                rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}").fetchall()
+                plans[table] = [row[-1] for row in rows]
+            else:
+                plans[table] = [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {query}").fetchall()]
+        except DBAPIError as e:
+            # The query may use columns a pending migration adds
+            plans[table] = [f"unavailable: {e.orig}"]
+        except NoSuchTableError:
+            plans[table] = ["unavailable: no such table"]
+    return plans
+
+
+def _begin(conn: Connection) -> None:
+    # pysqlite doesn't open a transaction before DDL on its own, so emit
+    # BEGIN explicitly to make each step (and dry runs) transactional
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")
+
+
+def run_migrations(engine: Engine) -> List[Migration]:
+    """
+    Apply pending migrations, each in its own transaction
+
+    Returns:
+        The migrations that were applied
+    """
+    with engine.connect() as conn:
+        _ensure_version_table(conn)
+        conn.commit()
+
+        applied = []
+        for migration in pending_migrations(conn):
+            conn.commit()
+            _begin(conn)
+            migration.upgrade(conn)
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, description, applied_at) "
+                    "VALUES (:version, :description, :applied_at)"
+                ),
+                {"version": migration.version, "description": migration.description, "applied_at": datetime.now()}
+            )
+            conn.commit()
+            applied.append(migration)
+        return applied
+
+
+def dry_run(engine: Engine) -> dict:
+    """
+    Apply pending migrations inside a transaction that is rolled back
+
+    Returns:
+        dict with the current version, the pending steps and the query
+        plans of the timeline list queries before and after migrating
+    """
+    with engine.connect() as conn:
+        _ensure_version_table(conn)
+        conn.commit()
+
+        _begin(conn)
+        current = get_schema_version(conn)
+        pending = pending_migrations(conn)
+        before = explain(conn)
+        for migration in pending:
+            migration.upgrade(conn)
+        after = explain(conn)
+        conn.rollback()
+
+    return {
+        "current_version": current,
+        "pending": [{"version": m.version, "description": m.description} for m in pending],
+        "plans": {
+            table: {"before": before[table], "after": after[table]}
+            for table in EXPLAIN_QUERIES
+        },
+    }
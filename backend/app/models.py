@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, List, Literal, Optional, Union
+from datetime import date, datetime
 from app.database import TimeOfDay, EventType, VomitQuality, MedicineType
 
 
@@ -98,7 +98,8 @@ class MedicineBase(BaseModel):
 
 class MedicineCreate(MedicineBase):
     """Medicine creation model"""
-    pass
+    stock_on_hand: Optional[float] = Field(None, ge=0)
+    pack_size: Optional[float] = Field(None, gt=0)
 
 
 class MedicineUpdate(BaseModel):
@@ -106,12 +107,21 @@ class MedicineUpdate(BaseModel):
     name: Optional[str] = None
     type: Optional[MedicineType] = None
     description: Optional[str] = None
+    stock_on_hand: Optional[float] = Field(None, ge=0)  # A new count; resets the doses counted against stock
+    pack_size: Optional[float] = Field(None, gt=0)
 
 
 class Medicine(MedicineBase):
     """Medicine response model"""
     id: str
     user_id: str
+    stock_on_hand: Optional[float] = None
+    pack_size: Optional[float] = None
+    stock_updated_at: Optional[datetime] = None
+    stock_remaining: Optional[float] = None
+    total_dosed: float = 0
+    daily_dose_rate: float = 0  # Average units per day over the recent window, as of today
+    run_out_date: Optional[date] = None
     created_at: datetime
     updated_at: datetime
 
@@ -256,6 +266,142 @@ class MedicineEvent(MedicineEventBase):
         from_attributes = True
 
 
+# Timeline models
+class TimelineItem(BaseModel):
+    """One entry of the merged timeline; kind says which record type it is"""
+    kind: Literal["event", "vet_visit", "medicine_event"]
+    id: str
+    dog_id: str
+    date: datetime
+    time_of_day: TimeOfDay
+    # Event fields
+    event_type: Optional[EventType] = None
+    custom_event_id: Optional[str] = None
+    poo_quality: Optional[int] = None
+    vomit_quality: Optional[VomitQuality] = None
+    # Vet visit fields
+    vet_id: Optional[str] = None
+    # Medicine event fields
+    medicine_id: Optional[str] = None
+    dosage: Optional[float] = None
+    notes: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class TimelinePage(BaseModel):
+    """A page of the merged timeline"""
+    items: List[TimelineItem]
+    next_cursor: Optional[str] = None
+
+
+# Analytics models
+class AnalyticsPoint(BaseModel):
+    """Totals for one dog, period and event type (or custom event)"""
+    period: date  # First day of the day, week (Monday) or month
+    dog_id: str
+    event_type: Optional[EventType] = None
+    custom_event_id: Optional[str] = None
+    count: int
+    poo_quality_avg: Optional[float] = None  # Over events that recorded a poo quality
+
+
+class AnalyticsResponse(BaseModel):
+    """Response model for event analytics"""
+    granularity: Literal["day", "week", "month"]
+    date_from: date
+    date_to: date
+    series: List[AnalyticsPoint]
+
+
+# Search models
+class SearchHit(BaseModel):
+    """A record whose notes (or name) match a search"""
+    type: Literal["event", "vet_visit", "medicine_event", "vet", "medicine"]
+    id: str
+    dog_id: Optional[str] = None
+    title: Optional[str] = None  # Vet or medicine name
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+    score: float  # bm25 relevance; lower is better
+
+
+class SearchResponse(BaseModel):
+    """Response model for full-text search"""
+    items: List[SearchHit]
+
+
+# Batch models
+class BatchOperation(BaseModel):
+    """One create, update or delete within a batch"""
+    op: Literal["create", "update", "delete"]
+    type: Literal["event", "vet_visit", "medicine_event"]
+    id: Optional[str] = None  # Required for update and delete
+    data: Optional[Dict[str, Any]] = None  # Create/Update payload for the record type
+
+
+class BatchRequest(BaseModel):
+    """Request model for batch mutations"""
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=500)
+    atomic: bool = False  # Apply nothing if any operation fails
+
+
+class BatchResult(BaseModel):
+    """Outcome of one batch operation, in request order"""
+    index: int
+    status: int
+    id: Optional[str] = None
+    detail: Optional[Any] = None
+    record: Optional[Union[Event, VetVisit, MedicineEvent]] = None
+
+
+class BatchResponse(BaseModel):
+    """Response model for batch mutations"""
+    applied: int
+    results: List[BatchResult]
+
+
+# Import models
+class ImportRowError(BaseModel):
+    """A rejected import row"""
+    line: int
+    error: str
+    row: Optional[Dict[str, Any]] = None
+
+
+class ImportReport(BaseModel):
+    """Response model for bulk imports"""
+    rows: int
+    inserted: Dict[str, int]
+    failed: int
+    elapsed_seconds: float
+    errors: List[ImportRowError] = []  # First IMPORT_MAX_REPORTED_ERRORS rejected rows
+
+
+# Sync models
+class Tombstone(BaseModel):
+    """A deleted record reported by delta sync"""
+    type: str  # dog, vet, medicine, custom_event, event, vet_visit, medicine_event
+    id: str
+    deleted_at: datetime
+
+
+class SyncResponse(BaseModel):
+    """Records changed and deleted since the client's sync token"""
+    token: str
+    full: bool
+    dogs: List[Dog] = []
+    vets: List[Vet] = []
+    medicines: List[Medicine] = []
+    custom_events: List[CustomEvent] = []
+    events: List[Event] = []
+    vet_visits: List[VetVisit] = []
+    medicine_events: List[MedicineEvent] = []
+    deleted: List[Tombstone] = []
+
+
 # Upload model
 class UploadResponse(BaseModel):
     """Response model for file uploads"""
@@ -0,0 +1,225 @@
+"""
+Per-user admission control
+
+The Dockerfile runs a single uvicorn worker, so one client stuck in a
+refetch loop can take all of it. AdmissionMiddleware keys every
+authenticated request on the JWT's sub and applies two limits before
+the request reaches a router:
+
+- a token bucket (ADMISSION_RATE_PER_SECOND refill, ADMISSION_BURST
+  capacity); heavy routes cost more tokens (ROUTE_COSTS)
+- at most ADMISSION_MAX_IN_FLIGHT requests running at once
+
+A request over either limit gets 429 with Retry-After. Requests without
+a valid token are passed through untouched; the routers reject them.
+
+State is one small record per active user, kept in least recently seen
+order so that users idle for ADMISSION_IDLE_SECONDS are evicted a few at
+a time on later requests. By then their bucket would have refilled
+anyway, so forgetting them changes nothing. Everything runs on the
+event loop, so no lock is needed.
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+from jose import JWTError
+from app.services.auth_service import verify_token
+import math
+import orjson
+import time
+import os
+
+ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "10"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "40"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+ADMISSION_IDLE_SECONDS = float(os.getenv("ADMISSION_IDLE_SECONDS", "300"))
+ADMISSION_UPLOAD_COST = float(os.getenv("ADMISSION_UPLOAD_COST", "5"))
+ADMISSION_EXPORT_COST = float(os.getenv("ADMISSION_EXPORT_COST", "10"))
+ADMISSION_IMPORT_COST = float(os.getenv("ADMISSION_IMPORT_COST", "10"))
+
+# Token cost by path prefix (first match wins); everything else costs 1
+ROUTE_COSTS: Tuple[Tuple[str, float], ...] = (
+    ("/api/upload", ADMISSION_UPLOAD_COST),
+    ("/api/export", ADMISSION_EXPORT_COST),
+    ("/api/import", ADMISSION_IMPORT_COST),
+)
+
+# Long-lived by design; they pay for connecting but hold no in-flight slot
+UNCOUNTED_PATHS = ("/api/stream",)
+
+# Idle users evicted per request at most, keeping each request O(1)
+EVICTIONS_PER_REQUEST = 4
+
+
+class UserAdmission:
+    """One user's bucket and in-flight count"""
+
+    __slots__ = ("tokens", "updated_at", "in_flight")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.in_flight = 0
+
+
+class AdmissionController:
+    """Token buckets and in-flight limits keyed by user ID"""
+
+    def __init__(
+        self,
+        rate: float = ADMISSION_RATE_PER_SECOND,
+        burst: float = ADMISSION_BURST,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        idle_seconds: float = ADMISSION_IDLE_SECONDS
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.idle_seconds = idle_seconds
+        self._users: "OrderedDict[str, UserAdmission]" = OrderedDict()
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_in_flight = 0
+        self.evictions = 0
+
+    def _evict_idle(self, now: float) -> None:
+        for _ in range(EVICTIONS_PER_REQUEST):
+            if not self._users:
+                return
+            user_id, state = next(iter(self._users.items()))
+            if now - state.updated_at < self.idle_seconds:
+                return
+            if state.in_flight:
+                # Still busy (a long export); look at it again later
+                self._users.move_to_end(user_id)
+                continue
+            del self._users[user_id]
+            self.evictions += 1
+
+    def acquire(self, user_id: str, cost: float, counted: bool = True) -> Optional[float]:
+        """
+        Admit a request of the given cost
+
+        Returns:
+            None if admitted (call release() afterwards when counted),
+            otherwise the seconds the client should wait
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = UserAdmission(self.burst, now)
+        else:
+            self._users.move_to_end(user_id)
+
+        if self.rate > 0:
+            state.tokens = min(self.burst, state.tokens + (now - state.updated_at) * self.rate)
+        state.updated_at = now
+
+        if counted and self.max_in_flight > 0 and state.in_flight >= self.max_in_flight:
+            self.rejected_in_flight += 1
+            return 1.0
+
+        if self.rate > 0:
+            # A cost above the burst could never be paid
+            cost = min(cost, self.burst)
+            if state.tokens < cost:
+                self.rejected_rate += 1
+                return (cost - state.tokens) / self.rate
+            state.tokens -= cost
+
+        if counted:
+            state.in_flight += 1
+        self.admitted += 1
+        return None
+
+    def release(self, user_id: str) -> None:
+        """Mark a counted request as finished"""
+        state = self._users.get(user_id)
+        if state is not None and state.in_flight:
+            state.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "max_in_flight": self.max_in_flight,
+            "active_users": len(self._users),
+            "in_flight": sum(state.in_flight for state in self._users.values()),
+            "admitted": self.admitted,
+            "rejected_rate": self.rejected_rate,
+            "rejected_in_flight": self.rejected_in_flight,
+            "evictions": self.evictions,
+        }
+
+
+admission_controller = AdmissionController()
+
+
+def route_cost(path: str) -> float:
+    for prefix, cost in ROUTE_COSTS:
+        if path.startswith(prefix):
+            return cost
+    return 1.0
+
+
+def _user_id(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme != "Bearer" or not token:
+                return None
+            try:
+                return verify_token(token)
+            except JWTError:
+                return None
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the AdmissionController to HTTP requests
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so the
+    in-flight slot is held until a streamed response has been sent.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        user_id = _user_id(scope)
+        if user_id is None:
+            return await self.app(scope, receive, send)
+
+        # Spares get_current_user verifying the same token again
+        scope.setdefault("state", {})["user_id"] = user_id
+
+        path = scope["path"]
+        counted = not path.startswith(UNCOUNTED_PATHS)
+        retry_after = self.controller.acquire(user_id, route_cost(path), counted)
+        if retry_after is not None:
+            return await self._reject(send, retry_after)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if counted:
+                self.controller.release(user_id)
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = orjson.dumps({"detail": "Too many requests, please retry shortly"})
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
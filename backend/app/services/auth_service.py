@@ -1,7 +1,14 @@
-from google.oauth2 import id_token
+from google.auth import jwt as google_jwt
 from google.auth.transport import requests
+from requests import Session
+from requests.adapters import HTTPAdapter
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import json
+import time
+import re
 import os
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
@@ -9,6 +16,123 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Offline key provider: JSON file mapping key ID -> PEM certificate
+GOOGLE_CERTS_FILE = os.getenv("GOOGLE_CERTS_FILE")
+# Used when Google's response carries no usable Cache-Control max-age
+GOOGLE_CERTS_DEFAULT_MAX_AGE = 300
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "10"))
+# Minimum seconds between downloads forced by a key ID missing from the cache
+GOOGLE_CERTS_REFRESH_COOLDOWN = float(os.getenv("GOOGLE_CERTS_REFRESH_COOLDOWN", "60"))
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+# Pooled HTTP transport shared by every verification
+_session = Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=GOOGLE_HTTP_POOL_SIZE))
+_transport = requests.Request(session=_session)
+
+# Certificate cache: (certs, expires_at on the monotonic clock)
+_certs_cache: Optional[Tuple[Dict[str, str], float]] = None
+_certs_fetched_at = float("-inf")
+_certs_lock = threading.Lock()
+
+
+def _fetch_google_certs() -> Tuple[Dict[str, str], float]:
+    """
+    Download Google's signing certificates
+
+    Returns:
+        Tuple of (key ID -> certificate mapping, max-age in seconds)
+    """
+    response = _transport(GOOGLE_CERTS_URL, method="GET")
+    if response.status != 200:
+        raise ValueError(f"Could not fetch Google certificates (HTTP {response.status})")
+
+    match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+    max_age = int(match.group(1)) if match else GOOGLE_CERTS_DEFAULT_MAX_AGE
+    return json.loads(response.data.decode("utf-8")), max_age
+
+
+def _load_certs_file() -> Tuple[Dict[str, str], float]:
+    """Load signing certificates from GOOGLE_CERTS_FILE (test mode)"""
+    with open(GOOGLE_CERTS_FILE) as f:
+        return json.load(f), float("inf")
+
+
+_certs_provider: Callable[[], Tuple[Dict[str, str], float]] = (
+    _load_certs_file if GOOGLE_CERTS_FILE else _fetch_google_certs
+)
+
+
+def set_certs_provider(provider: Optional[Callable[[], Tuple[Dict[str, str], float]]]) -> None:
+    """
+    Replace the certificate source, e.g. with a local key set for offline benchmarks
+
+    Args:
+        provider: Callable returning (certs, max_age_seconds), or None to restore the default
+    """
+    global _certs_provider, _certs_cache, _certs_fetched_at
+    with _certs_lock:
+        _certs_provider = provider or (_load_certs_file if GOOGLE_CERTS_FILE else _fetch_google_certs)
+        _certs_cache = None
+        _certs_fetched_at = float("-inf")
+
+
+def _cached_certs(key_id: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    The cached certificates if they can answer for key_id, None if a download is needed
+
+    Raises:
+        ValueError: If key_id is unknown and the certificates were downloaded
+            less than GOOGLE_CERTS_REFRESH_COOLDOWN seconds ago
+    """
+    cached = _certs_cache
+    now = time.monotonic()
+    if not cached or cached[1] <= now:
+        return None
+    if key_id is None or key_id in cached[0]:
+        return cached[0]
+    if now - _certs_fetched_at < GOOGLE_CERTS_REFRESH_COOLDOWN:
+        raise ValueError(f"Unknown certificate key ID {key_id!r}")
+    return None
+
+
+def get_google_certs(key_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    Return Google's signing certificates, honouring the Cache-Control max-age
+
+    Concurrent callers share a single refresh. A key ID missing from the
+    cached set triggers an early refresh, to pick up rotated keys, but at
+    most once per GOOGLE_CERTS_REFRESH_COOLDOWN: tokens with made-up key
+    IDs are rejected in between without a download.
+
+    Args:
+        key_id: Key ID the caller needs, if known
+
+    Returns:
+        Mapping of key ID to x.509 certificate
+
+    Raises:
+        ValueError: If key_id is unknown and a refresh is cooling down
+    """
+    global _certs_cache, _certs_fetched_at
+    certs = _cached_certs(key_id)
+    if certs is not None:
+        return certs
+
+    with _certs_lock:
+        # Another thread may have refreshed while we waited for the lock
+        certs = _cached_certs(key_id)
+        if certs is not None:
+            return certs
+
+        certs, max_age = _certs_provider()
+        _certs_fetched_at = time.monotonic()
+        _certs_cache = (certs, _certs_fetched_at + max_age)
+        return certs
+
 
 def verify_google_token(token: str) -> dict:
     """
@@ -24,9 +148,10 @@ def verify_google_token(token: str) -> dict:
         ValueError: If token is invalid
     """
     try:
-        idinfo = id_token.verify_oauth2_token(
-            token, requests.Request(), GOOGLE_CLIENT_ID
-        )
+        certs = get_google_certs(google_jwt.decode_header(token).get("kid"))
+        idinfo = google_jwt.decode(token, certs=certs, audience=GOOGLE_CLIENT_ID)
+        if idinfo["iss"] not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo['iss']}")
 
         return {
             "id": idinfo["sub"],
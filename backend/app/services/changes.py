@@ -0,0 +1,122 @@
+"""
+Change tracking for the current user's data
+
+List endpoints build strong ETags from the user's data version, the
+sum of counters the database bumps in the same transaction as every
+write to the user's records (see app.services.versions): an unchanged version
+means an unchanged response, so If-None-Match can be answered with 304
+after one small indexed read, before any table is scanned. Writes
+made outside the API (command-line imports and rebuilds) move it too.
+
+Every router mutation also calls publish_change after it commits. That
+drops the user's cached list responses that the change affects (see
+app.services.response_cache) and pushes a compact notification to the
+user's open /api/stream connections (see app.services.stream), numbered
+by an in-process change sequence.
+
+A random per-boot epoch goes into both ETags and stream event IDs, so a
+restart simply invalidates every client's cached copy.
+"""
+from fastapi import Depends, HTTPException, Request, Response
+from datetime import date
+from typing import Dict, Optional
+from app.database import DBUser
+from app.api.auth import get_current_user
+from app.services.response_cache import invalidate_for_change
+from app.services.stream import change_hub, sse_frame
+from app.services.versions import DataVersions, current_data_versions
+import threading
+import hashlib
+import secrets
+
+
+class ChangeSequence:
+    """Monotonic per-user counters numbering the changes published to streams"""
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            return version
+
+
+change_sequence = ChangeSequence()
+
+
+def stream_event_id(version: int) -> str:
+    """SSE event ID for a change sequence number; the epoch makes IDs from before a restart stale"""
+    return f"{change_sequence.epoch}-{version}"
+
+
+def publish_change(user_id: str, entity_type: str, entity_id: Optional[str], op: str) -> int:
+    """
+    Record that a user's data changed; call after the mutation commits
+
+    Args:
+        user_id: Owner of the changed record
+        entity_type: dog, vet, medicine, custom_event, event, vet_visit or medicine_event
+        entity_id: ID of the changed record, or None for bulk changes
+        op: create, update or delete
+
+    Returns:
+        The user's new change sequence number
+    """
+    invalidate_for_change(user_id, entity_type)
+    version = change_sequence.bump(user_id)
+    if change_hub.has_subscribers(user_id):
+        change_hub.publish(user_id, sse_frame(
+            "change",
+            {"type": entity_type, "id": entity_id, "op": op, "version": version},
+            stream_event_id(version)
+        ))
+    return version
+
+
+def make_etag(user_id: str, version: int, request: Request) -> str:
+    """
+    Strong ETag for a list response: data version plus the exact query
+
+    The user is hashed in too, so two users at the same version never
+    share a tag for the same URL, and so is the day, as some values are
+    computed from the clock (a medicine's forecast, default date ranges).
+    """
+    query = hashlib.blake2b(
+        f"{user_id}:{date.today().isoformat()}:{request.url.path}?{request.url.query}".encode(), digest_size=6
+    ).hexdigest()
+    return f'"{change_sequence.epoch}-{version}-{query}"'
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: DBUser = Depends(get_current_user),
+    versions: DataVersions = Depends(current_data_versions)
+) -> str:
+    """
+    Dependency adding ETag support to a list endpoint
+
+    Raises:
+        HTTPException: 304 Not Modified when If-None-Match matches
+    """
+    etag = make_etag(current_user.id, versions.total, request)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison: compression hands clients a W/ copy of the tag
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Vary": "Authorization"})
+
+    response.headers["ETag"] = etag
+    # The body depends on who asks, not only on the URL
+    response.headers["Vary"] = "Authorization"
+    # Let browsers cache but always revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    return etag
@@ -0,0 +1,219 @@
+"""
+Negotiated response compression
+
+List responses are large JSON arrays, and dogs and uploads carry base64
+data-URI pictures; both compress well (JSON several times over, base64
+by about a quarter). CompressionMiddleware picks brotli or gzip from the
+request's Accept-Encoding (q-values honoured, brotli preferred on a
+tie) and compresses the body as it is sent, so a StreamingResponse
+(e.g. an export) is compressed chunk by chunk without being buffered.
+
+Skipped: bodies under COMPRESSION_MINIMUM_SIZE, responses that already
+have a Content-Encoding, already-compressed media types (images, zip,
+...), and text/event-stream, where buffering inside the compressor
+would hold events back.
+
+A compressed body is a different representation, so its ETag is
+weakened (as nginx does); conditional_get compares ETags weakly, so
+revalidation keeps answering 304. Eligible responses get
+Vary: Accept-Encoding whether or not this request was compressed.
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from typing import Dict, List, Optional
+import brotli
+import time
+import zlib
+import os
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Server preference when the client accepts several equally
+ENCODINGS = ("br", "gzip")
+
+# Content types that are compressed already or must not be buffered
+SKIPPED_CONTENT_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/octet-stream", "application/pdf",
+    "text/event-stream",
+)
+
+
+class GzipEncoder:
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        # wbits 31: zlib stream wrapped in a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+ENCODERS = {"br": BrotliEncoder, "gzip": GzipEncoder}
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Choose an encoding the client accepts, or None for identity"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressible(status: int, headers: Headers) -> bool:
+    """Whether a response may be compressed at all (independently of the request)"""
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return not content_type.startswith(SKIPPED_CONTENT_TYPES)
+
+
+class CompressionStats:
+    """Totals over compressed responses, per encoding"""
+
+    def __init__(self):
+        self.responses: Dict[str, int] = {encoding: 0 for encoding in ENCODINGS}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "minimum_size": COMPRESSION_MINIMUM_SIZE,
+            "responses": dict(self.responses),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "cpu_ms": round(self.seconds * 1000, 3),
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class _Responder:
+    """Compresses one response on its way out"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[dict] = None
+        self.passthrough = False
+        self.encoder = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+
+    async def __call__(self, message: dict) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            if compressible(message["status"], headers):
+                headers.add_vary_header("Accept-Encoding")
+                if self.encoding is not None:
+                    # Hold the headers until the body size is known
+                    self.start = message
+                    return
+            self.passthrough = True
+            await self.send(message)
+        elif message_type == "http.response.body" and not self.passthrough:
+            await self._body(message.get("body", b""), message.get("more_body", False))
+        else:
+            await self.send(message)
+
+    async def _body(self, body: bytes, more_body: bool) -> None:
+        if self.encoder is None:
+            # Collect a streamed response's first chunks until it is clearly big enough
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if self.pending_size < self.minimum_size:
+                if more_body:
+                    return
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": b"".join(self.pending)})
+                return
+            body = b"".join(self.pending)
+            self.pending = []
+            self.encoder = ENCODERS[self.encoding]()
+            self._start_compressed()
+
+        started = time.perf_counter()
+        out = self.encoder.compress(body)
+        if not more_body:
+            out += self.encoder.finish()
+        compression_stats.seconds += time.perf_counter() - started
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(out)
+
+        if self.start is not None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not more_body:
+                headers["Content-Length"] = str(len(out))
+            await self.send(self.start)
+            self.start = None
+        if out or not more_body:
+            await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+    def _start_compressed(self) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        compression_stats.responses[self.encoding] += 1
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing HTTP responses with brotli or gzip
+
+    A plain ASGI middleware that rewrites each http.response.body message
+    as it passes, so streamed responses stay streamed.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size))
@@ -0,0 +1,125 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import functools
+import threading
+import asyncio
+import time
+import os
+
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "4"))
+BLOCKING_EXECUTOR_MAX_QUEUE = int(os.getenv("BLOCKING_EXECUTOR_MAX_QUEUE", "32"))
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the blocking executor's queue is full"""
+    pass
+
+
+class BlockingExecutor:
+    """
+    Size-bounded thread pool for CPU-bound and blocking-IO work
+
+    Keeps token verification, image decoding and similar work off the
+    event loop. At most max_workers jobs run at once and at most max_queue
+    more may wait; further submissions are rejected immediately with
+    ExecutorSaturatedError instead of piling up behind a slow job.
+    """
+
+    def __init__(self, max_workers: int = BLOCKING_EXECUTOR_WORKERS, max_queue: int = BLOCKING_EXECUTOR_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="barkly-blocking")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.peak_pending = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError("Server is busy, please retry shortly")
+            self._pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+
+    def _release_unstarted(self, future: Optional[Future] = None) -> None:
+        """Give back the slot of a job that will never run (submit failed or cancelled while queued)"""
+        if future is not None and not future.cancelled():
+            return
+        with self._lock:
+            self._pending -= 1
+            self.abandoned += 1
+
+    def _call(self, func: Callable[..., Any], submitted_at: float) -> Any:
+        started_at = time.perf_counter()
+        ok = False
+        try:
+            result = func()
+            ok = True
+            return result
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._pending -= 1
+                self.total_wait_seconds += started_at - submitted_at
+                self.total_run_seconds += finished_at - started_at
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run func(*args, **kwargs) in the pool and await its result
+
+        Raises:
+            ExecutorSaturatedError: If the queue is already full
+        """
+        self._acquire_slot()
+        try:
+            future = self._pool.submit(self._call, functools.partial(func, *args, **kwargs), time.perf_counter())
+        except BaseException:
+            # e.g. RuntimeError once the pool is shut down
+            self._release_unstarted()
+            raise
+        # _call releases the slot once the job runs; this covers a job cancelled before it started
+        future.add_done_callback(self._release_unstarted)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        """Return executor metrics"""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "queued": max(self._pending - self.max_workers, 0),
+                "peak_pending": self.peak_pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "abandoned": self.abandoned,
+                "avg_wait_ms": round(self.total_wait_seconds / finished * 1000, 3) if finished else 0.0,
+                "avg_run_ms": round(self.total_run_seconds / finished * 1000, 3) if finished else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and wait for running jobs"""
+        self._pool.shutdown(wait=True)
+
+
+blocking_executor = BlockingExecutor()
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking callable on the shared blocking executor"""
+    return await blocking_executor.run(func, *args, **kwargs)
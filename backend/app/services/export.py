@@ -0,0 +1,131 @@
+"""
+Streaming export of a user's full history
+
+Rows are read with server-side iteration (yield_per) and serialized
+batch by batch, so memory stays flat however large the history is. On
+SQLite the whole export runs in one explicit read transaction (the
+driver would otherwise run each section's SELECT in autocommit), which
+in WAL mode is a consistent snapshot even while the user keeps writing.
+
+NDJSON lines carry a "type" key naming the record type. CSV output is a
+single table over the union of all columns with the same "type" column
+first, so events, vet visits and medicine events can be fed straight
+back to the bulk importer. A column that would clash with that key is
+exported under another name (a medicine's own type is medicine_type),
+and stock bookkeeping that only the server interprets is left out.
+"""
+from sqlalchemy import select, text
+from datetime import datetime
+from typing import AsyncIterator, List
+from app.database import (
+    AsyncSessionLocal, async_engine, DBDog, DBVet, DBMedicine, DBCustomEvent,
+    DBEvent, DBVetVisit, DBMedicineEvent
+)
+import csv
+import enum
+import io
+import json
+import os
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+FORMATS = ("ndjson", "csv")
+
+# Export order: parents before the records that reference them
+SECTIONS = [
+    ("dog", DBDog),
+    ("vet", DBVet),
+    ("medicine", DBMedicine),
+    ("custom_event", DBCustomEvent),
+    ("event", DBEvent),
+    ("vet_visit", DBVetVisit),
+    ("medicine_event", DBMedicineEvent),
+]
+
+# Large base64 images, only exported on request
+PICTURE_COLUMNS = {("dogs", "profile_picture")}
+
+# Running totals and the stored (unfaded) dosing rate maintained by app.services.stock
+INTERNAL_COLUMNS = {
+    ("medicines", name)
+    for name in ("dosed_since_stock", "total_dosed", "daily_dose_rate", "last_dosed_at")
+}
+
+# Columns exported under another name, so they do not overwrite the "type" key
+RENAMED_COLUMNS = {("medicines", "type"): "medicine_type"}
+
+
+def _columns(model, include_pictures: bool) -> list:
+    """The exported columns of a section, labelled with their export names"""
+    columns = []
+    for column in model.__table__.columns:
+        key = (column.table.name, column.name)
+        if key in INTERNAL_COLUMNS or (not include_pictures and key in PICTURE_COLUMNS):
+            continue
+        name = RENAMED_COLUMNS.get(key)
+        columns.append(column.label(name) if name else column)
+    return columns
+
+
+def csv_header(include_pictures: bool) -> List[str]:
+    """Ordered union of the exported columns of every section"""
+    header = ["type"]
+    for _, model in SECTIONS:
+        for column in _columns(model, include_pictures):
+            if column.name not in header:
+                header.append(column.name)
+    return header
+
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _query(model, user_id: str, include_pictures: bool):
+    query = select(*_columns(model, include_pictures)).where(model.user_id == user_id)
+    if hasattr(model, "date"):
+        # Walks the (user_id, date) index
+        return query.order_by(model.date.desc())
+    return query.order_by(model.id)
+
+
+async def export_rows(user_id: str, fmt: str, include_pictures: bool = False) -> AsyncIterator[str]:
+    """
+    Yield a user's records as NDJSON or CSV text, one batch per chunk
+
+    Opens its own session: the request's session is closed before a
+    streaming response body is sent.
+    """
+    header = csv_header(include_pictures) if fmt == "csv" else None
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header) if header else None
+
+    if writer:
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    async with AsyncSessionLocal() as db:
+        if async_engine.dialect.name == "sqlite":
+            # Deferred: the snapshot is taken by the first SELECT and held until the rollback below
+            await db.execute(text("BEGIN"))
+        for record_type, model in SECTIONS:
+            result = await db.stream(
+                _query(model, user_id, include_pictures).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for rows in result.mappings().partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                for row in rows:
+                    record = {"type": record_type}
+                    record.update((key, _plain(value)) for key, value in row.items())
+                    if writer:
+                        writer.writerow(record)
+                    else:
+                        buffer.write(json.dumps(record, separators=(",", ":")))
+                        buffer.write("\n")
+                yield buffer.getvalue()
+        await db.rollback()
@@ -0,0 +1,192 @@
+"""
+Server-side filters for the timeline list endpoints
+
+Each filter is parsed from query parameters by a FastAPI dependency,
+validated, and compiled once into SQLAlchemy clauses for the model it
+applies to. Dog and date bounds narrow the (dog_id, date) index range;
+the remaining clauses are checked against rows inside that range.
+"""
+from fastapi import HTTPException, Query
+from sqlalchemy import or_
+from datetime import datetime
+from typing import Iterable, List, Optional
+from app.database import TimeOfDay, EventType
+
+
+class TimelineFilter:
+    """Filters shared by events, vet visits and medicine events"""
+
+    def __init__(
+        self,
+        dog_ids: Optional[List[str]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        times_of_day: Optional[List[TimeOfDay]] = None
+    ):
+        if date_from and date_to and date_from > date_to:
+            raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+        self.dog_ids = list(dict.fromkeys(dog_ids)) if dog_ids else []
+        self.date_from = date_from
+        self.date_to = date_to
+        self.times_of_day = list(dict.fromkeys(times_of_day)) if times_of_day else []
+
+    def check_dogs(self, user_dog_ids: Iterable[str]) -> None:
+        """
+        Ensure every requested dog belongs to the user
+
+        Args:
+            user_dog_ids: The user's dogs (at least those among the requested)
+
+        Raises:
+            HTTPException: If any requested dog is not the user's
+        """
+        allowed = set(user_dog_ids)
+        if any(dog_id not in allowed for dog_id in self.dog_ids):
+            raise HTTPException(status_code=403, detail="Access denied to this dog")
+
+    def compile(self, model) -> list:
+        """Compile the filter into SQLAlchemy clauses for model"""
+        clauses = []
+        if self.dog_ids:
+            clauses.append(model.dog_id.in_(self.dog_ids))
+        if self.date_from:
+            clauses.append(model.date >= self.date_from)
+        if self.date_to:
+            clauses.append(model.date <= self.date_to)
+        if self.times_of_day:
+            clauses.append(model.time_of_day.in_(self.times_of_day))
+        return clauses
+
+
+class EventFilter(TimelineFilter):
+    """Timeline filters plus event type, custom event and poo quality"""
+
+    def __init__(
+        self,
+        event_types: Optional[List[EventType]] = None,
+        custom_event_ids: Optional[List[str]] = None,
+        poo_quality_min: Optional[int] = None,
+        poo_quality_max: Optional[int] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        if poo_quality_min is not None and poo_quality_max is not None and poo_quality_min > poo_quality_max:
+            raise HTTPException(status_code=400, detail="poo_quality_min must not exceed poo_quality_max")
+
+        self.event_types = list(dict.fromkeys(event_types)) if event_types else []
+        self.custom_event_ids = list(dict.fromkeys(custom_event_ids)) if custom_event_ids else []
+        self.poo_quality_min = poo_quality_min
+        self.poo_quality_max = poo_quality_max
+
+    def compile(self, model) -> list:
+        clauses = super().compile(model)
+
+        # Built-in and custom types are alternatives: either kind matches
+        kinds = []
+        if self.event_types:
+            kinds.append(model.event_type.in_(self.event_types))
+        if self.custom_event_ids:
+            kinds.append(model.custom_event_id.in_(self.custom_event_ids))
+        if kinds:
+            clauses.append(or_(*kinds))
+
+        if self.poo_quality_min is not None:
+            clauses.append(model.poo_quality >= self.poo_quality_min)
+        if self.poo_quality_max is not None:
+            clauses.append(model.poo_quality <= self.poo_quality_max)
+        return clauses
+
+
+class VetVisitFilter(TimelineFilter):
+    """Timeline filters plus vet"""
+
+    def __init__(self, vet_ids: Optional[List[str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.vet_ids = list(dict.fromkeys(vet_ids)) if vet_ids else []
+
+    def compile(self, model) -> list:
+        clauses = super().compile(model)
+        if self.vet_ids:
+            clauses.append(model.vet_id.in_(self.vet_ids))
+        return clauses
+
+
+class MedicineEventFilter(TimelineFilter):
+    """Timeline filters plus medicine"""
+
+    def __init__(self, medicine_ids: Optional[List[str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.medicine_ids = list(dict.fromkeys(medicine_ids)) if medicine_ids else []
+
+    def compile(self, model) -> list:
+        clauses = super().compile(model)
+        if self.medicine_ids:
+            clauses.append(model.medicine_id.in_(self.medicine_ids))
+        return clauses
+
+
+# Dependencies parsing the filters from query parameters.
+# List parameters are repeated: ?dog_id=a&dog_id=b
+
+def timeline_filter(
+    dog_id: Optional[List[str]] = Query(None, description="Only these dogs"),
+    date_from: Optional[datetime] = Query(None, description="Inclusive lower bound on date"),
+    date_to: Optional[datetime] = Query(None, description="Inclusive upper bound on date"),
+    time_of_day: Optional[List[TimeOfDay]] = Query(None, description="Only these times of day")
+) -> TimelineFilter:
+    return TimelineFilter(dog_ids=dog_id, date_from=date_from, date_to=date_to, times_of_day=time_of_day)
+
+
+def event_filter(
+    dog_id: Optional[List[str]] = Query(None, description="Only these dogs"),
+    date_from: Optional[datetime] = Query(None, description="Inclusive lower bound on date"),
+    date_to: Optional[datetime] = Query(None, description="Inclusive upper bound on date"),
+    time_of_day: Optional[List[TimeOfDay]] = Query(None, description="Only these times of day"),
+    event_type: Optional[List[EventType]] = Query(None, description="Only these built-in event types"),
+    custom_event_id: Optional[List[str]] = Query(None, description="Only these custom event types"),
+    poo_quality_min: Optional[int] = Query(None, ge=1, le=7),
+    poo_quality_max: Optional[int] = Query(None, ge=1, le=7)
+) -> EventFilter:
+    return EventFilter(
+        dog_ids=dog_id,
+        date_from=date_from,
+        date_to=date_to,
+        times_of_day=time_of_day,
+        event_types=event_type,
+        custom_event_ids=custom_event_id,
+        poo_quality_min=poo_quality_min,
+        poo_quality_max=poo_quality_max
+    )
+
+
+def vet_visit_filter(
+    dog_id: Optional[List[str]] = Query(None, description="Only these dogs"),
+    date_from: Optional[datetime] = Query(None, description="Inclusive lower bound on date"),
+    date_to: Optional[datetime] = Query(None, description="Inclusive upper bound on date"),
+    time_of_day: Optional[List[TimeOfDay]] = Query(None, description="Only these times of day"),
+    vet_id: Optional[List[str]] = Query(None, description="Only these vets")
+) -> VetVisitFilter:
+    return VetVisitFilter(
+        dog_ids=dog_id,
+        date_from=date_from,
+        date_to=date_to,
+        times_of_day=time_of_day,
+        vet_ids=vet_id
+    )
+
+
+def medicine_event_filter(
+    dog_id: Optional[List[str]] = Query(None, description="Only these dogs"),
+    date_from: Optional[datetime] = Query(None, description="Inclusive lower bound on date"),
+    date_to: Optional[datetime] = Query(None, description="Inclusive upper bound on date"),
+    time_of_day: Optional[List[TimeOfDay]] = Query(None, description="Only these times of day"),
+    medicine_id: Optional[List[str]] = Query(None, description="Only these medicines")
+) -> MedicineEventFilter:
+    return MedicineEventFilter(
+        dog_ids=dog_id,
+        date_from=date_from,
+        date_to=date_to,
+        times_of_day=time_of_day,
+        medicine_ids=medicine_id
+    )
@@ -0,0 +1,283 @@
+"""
+Bulk import of historical events, vet visits and medicine events
+
+Rows are read one at a time from CSV or NDJSON, so memory use does not
+grow with the file. Dog, vet, medicine and custom event references may
+be names or IDs; both are resolved against in-memory maps of the user's
+records built with one query per table up front. Each row is validated
+with the same schema as the matching POST endpoint, and valid rows are
+inserted with executemany in chunks of IMPORT_CHUNK_SIZE, one
+transaction per chunk so API writers are never locked out for long.
+Event rollups and medicine stock totals are adjusted once per chunk from
+the aggregated rows.
+
+Columns (CSV header or NDJSON keys):
+    type            event, vet_visit or medicine_event (or set a default)
+    dog             dog name or ID (dog_id also accepted)
+    date, time_of_day, notes
+    event_type, custom_event, poo_quality, vomit_quality   for events
+    vet                                                    for vet visits
+    medicine, dosage                                       for medicine events
+"""
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from datetime import datetime
+from typing import Callable, Dict, IO, Iterator, List, Optional, Tuple
+from app.database import DBDog, DBVet, DBMedicine, DBCustomEvent, DBEvent, DBVetVisit, DBMedicineEvent
+from app.models import EventCreate, VetVisitCreate, MedicineEventCreate
+from app.services.rollups import aggregate, apply_deltas, EventSnapshot
+from app.services.stock import apply_doses, DoseSnapshot
+import csv
+import json
+import os
+import time
+import uuid
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+FORMATS = ("csv", "ndjson")
+
+# Record type -> (table, create schema)
+RECORD_TYPES = {
+    "event": (DBEvent.__table__, EventCreate),
+    "vet_visit": (DBVetVisit.__table__, VetVisitCreate),
+    "medicine_event": (DBMedicineEvent.__table__, MedicineEventCreate),
+}
+
+# Reference column -> (model, schema field); the column may hold a name or an ID
+REFERENCES = {
+    "dog": (DBDog, "dog_id"),
+    "vet": (DBVet, "vet_id"),
+    "medicine": (DBMedicine, "medicine_id"),
+    "custom_event": (DBCustomEvent, "custom_event_id"),
+}
+
+# Marks a name shared by several of the user's records
+AMBIGUOUS = object()
+
+
+class RowError(Exception):
+    """A row could not be imported"""
+
+
+class ImportStats:
+    """Running counters for an import, passed to the progress callback"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted: Dict[str, int] = {record_type: 0 for record_type in RECORD_TYPES}
+        self.failed = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": dict(self.inserted),
+            "failed": self.failed,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    """Guess csv or ndjson from a file name or content type"""
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Yield (line number, row, parse error) one row at a time
+
+    Empty CSV cells become None so optional fields stay unset.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {
+                key.strip(): (value.strip() or None) if isinstance(value, str) else value
+                for key, value in row.items() if key
+            }, None
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_num, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, "Expected a JSON object"
+                continue
+            yield line_num, row, None
+
+
+def load_name_maps(conn, user_id: str) -> Dict[str, Dict[str, object]]:
+    """
+    Map each of the user's dogs, vets, medicines and custom events by ID and by name
+
+    Names are matched case-insensitively; a name shared by two records
+    maps to AMBIGUOUS and must be referenced by ID instead.
+    """
+    maps = {}
+    for column, (model, _) in REFERENCES.items():
+        records = conn.execute(select(model.id, model.name).where(model.user_id == user_id)).all()
+        lookup: Dict[str, object] = {}
+        for record_id, name in records:
+            key = name.strip().casefold()
+            lookup[key] = AMBIGUOUS if key in lookup else record_id
+        # IDs win over names that happen to look like an ID
+        lookup.update((record_id, record_id) for record_id, _ in records)
+        maps[column] = lookup
+    return maps
+
+
+def build_record(row: dict, default_type: Optional[str], maps: Dict[str, Dict[str, object]]) -> Tuple[str, dict]:
+    """
+    Resolve references and validate one row
+
+    Returns:
+        Tuple of (record type, column values ready to insert)
+
+    Raises:
+        RowError: If the row is invalid or references unknown records
+    """
+    record_type = row.get("type") or default_type
+    if record_type not in RECORD_TYPES:
+        raise RowError(f"Unknown record type {record_type!r}; expected one of {', '.join(RECORD_TYPES)}")
+    _, schema = RECORD_TYPES[record_type]
+
+    data = {key: value for key, value in row.items() if key != "type"}
+    for column, (_, field) in REFERENCES.items():
+        by_name, by_id = data.pop(column, None), data.pop(field, None)
+        reference = by_name if by_name is not None else by_id
+        if reference is None:
+            continue
+        if field not in schema.model_fields:
+            raise RowError(f"{column} does not apply to {record_type} rows")
+        reference = str(reference).strip()
+        resolved = maps[column].get(reference) or maps[column].get(reference.casefold())
+        if resolved is AMBIGUOUS:
+            raise RowError(f"{column} name {reference!r} is ambiguous; use its ID")
+        if resolved is None:
+            raise RowError(f"{column} {reference!r} not found")
+        data[field] = resolved
+
+    try:
+        record = schema.model_validate(data)
+    except ValidationError as e:
+        raise RowError("; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors(include_url=False)
+        ))
+
+    if record_type == "event":
+        if not record.event_type and not record.custom_event_id:
+            raise RowError("Either event_type or custom_event must be provided")
+        if record.event_type and record.custom_event_id:
+            raise RowError("Cannot specify both event_type and custom_event")
+
+    values = record.model_dump()
+    values["id"] = str(uuid.uuid4())
+    return record_type, values
+
+
+def import_records(
+    engine: Engine,
+    user_id: str,
+    stream: IO[str],
+    fmt: str,
+    default_type: Optional[str] = None,
+    errors: Optional[IO[str]] = None,
+    progress: Optional[Callable[[ImportStats], None]] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE
+) -> ImportStats:
+    """
+    Import records for a user from a CSV or NDJSON text stream
+
+    Blocking; call it from the CLI or through run_blocking.
+
+    Args:
+        engine: Sync engine to insert with
+        user_id: Owner of the imported records
+        stream: Text stream to read rows from
+        fmt: csv or ndjson
+        default_type: Record type for rows without a type column
+        errors: Optional text stream receiving one NDJSON line per rejected row
+        progress: Optional callback invoked after every inserted chunk
+        chunk_size: Rows per executemany batch and transaction
+
+    Returns:
+        The final import counters
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+
+    stats = ImportStats()
+    pending: Dict[str, List[dict]] = {record_type: [] for record_type in RECORD_TYPES}
+    buffered = 0
+
+    with engine.connect() as conn:
+        maps = load_name_maps(conn, user_id)
+        conn.rollback()
+
+        def flush():
+            nonlocal buffered
+            now = datetime.now()
+            with conn.begin():
+                for record_type, rows in pending.items():
+                    if not rows:
+                        continue
+                    for values in rows:
+                        values["user_id"] = user_id
+                        values["created_at"] = now
+                        values["updated_at"] = now
+                    conn.execute(RECORD_TYPES[record_type][0].insert(), rows)
+                    if record_type == "event":
+                        apply_deltas(conn, aggregate(
+                            (EventSnapshot(
+                                values["dog_id"], values["date"].date(), values["event_type"],
+                                values["custom_event_id"], values["poo_quality"]
+                            ), 1)
+                            for values in rows
+                        ))
+                    elif record_type == "medicine_event":
+                        apply_doses(conn, (
+                            DoseSnapshot(values["medicine_id"], values["date"], values["dosage"])
+                            for values in rows
+                        ))
+                    stats.inserted[record_type] += len(rows)
+                    rows.clear()
+            buffered = 0
+            if progress:
+                progress(stats)
+
+        for line_num, row, parse_error in read_rows(stream, fmt):
+            stats.rows += 1
+            try:
+                if parse_error:
+                    raise RowError(parse_error)
+                record_type, values = build_record(row, default_type, maps)
+            except RowError as e:
+                stats.failed += 1
+                if errors is not None:
+                    errors.write(json.dumps({"line": line_num, "error": str(e), "row": row}, default=str) + "\n")
+                continue
+
+            pending[record_type].append(values)
+            buffered += 1
+            if buffered >= chunk_size:
+                flush()
+
+        if buffered:
+            flush()
+
+    return stats
@@ -0,0 +1,161 @@
+"""
+Ownership-scoped data access
+
+Set-based checks resolve ownership for many IDs at once, one query per
+table, instead of one SELECT per referenced record.
+
+Every record carries its owner's user_id (events, vet visits and
+medicine events copy it from their dog), so ownership is a column
+comparison, never a join. The single-record helpers serve the event,
+vet visit and medicine event routes: fetch_owned loads a record and the
+ownership of any records it is about to reference in one statement, and
+update_owned / delete_owned write with UPDATE / DELETE ... RETURNING, so
+a read is one round trip and a mutation two (one for a delete).
+"""
+from fastapi import HTTPException
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Any
+
+
+class Reference(NamedTuple):
+    """A record a write is about to point at, which must be the user's"""
+    field: str
+    model: Any
+    record_id: str
+    detail: str  # 404 detail when the user does not own it
+
+
+async def owned_ids(db: AsyncSession, model, ids: Iterable[str], user_id: str) -> Set[str]:
+    """Return the subset of ids that belong to the user"""
+    ids = {i for i in ids if i}
+    if not ids:
+        return set()
+    return set((await db.scalars(
+        select(model.id).where(model.id.in_(ids), model.user_id == user_id)
+    )).all())
+
+
+async def records_with_owner(db: AsyncSession, model, ids: Iterable[str]) -> Dict[str, Tuple[Any, str]]:
+    """
+    Load records together with the user who owns them
+
+    One query; missing IDs are absent from the result so callers can
+    tell 404 from 403.
+
+    Returns:
+        Mapping of record ID to (record, owner user ID)
+    """
+    ids = {i for i in ids if i}
+    if not ids:
+        return {}
+    records = (await db.scalars(select(model).where(model.id.in_(ids)))).all()
+    return {record.id: (record, record.user_id) for record in records}
+
+
+def _reference_checks(references: Iterable[Reference], user_id: str) -> list:
+    return [
+        exists().where(ref.model.id == ref.record_id, ref.model.user_id == user_id).label(f"{ref.field}_owned")
+        for ref in references
+    ]
+
+
+def _check_references(row, references: Iterable[Reference]) -> None:
+    for ref in references:
+        if not getattr(row, f"{ref.field}_owned"):
+            raise HTTPException(status_code=404, detail=ref.detail)
+
+
+async def check_references(db: AsyncSession, user_id: str, references: List[Reference]) -> None:
+    """
+    Verify in one statement that the user owns every referenced record
+
+    Raises:
+        HTTPException: 404 with the first unowned reference's detail
+    """
+    if references:
+        row = (await db.execute(select(*_reference_checks(references, user_id)))).one()
+        _check_references(row, references)
+
+
+async def fetch_owned(
+    db: AsyncSession,
+    model,
+    record_id: str,
+    user_id: str,
+    not_found: str,
+    references: Optional[List[Reference]] = None
+) -> Row:
+    """
+    Load a record's columns and its references' ownership in one statement
+
+    Returns:
+        The record's row (attributes as on the model)
+
+    Raises:
+        HTTPException: 404 not_found if missing, 403 if another user's,
+            404 with the reference's detail if a reference is not the user's
+    """
+    references = references or []
+    query = select(model.__table__, *_reference_checks(references, user_id)).where(model.id == record_id)
+    row = (await db.execute(query)).first()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    if row.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    _check_references(row, references)
+    return row
+
+
+async def update_owned(
+    db: AsyncSession,
+    model,
+    record_id: str,
+    values: dict,
+    user_id: Optional[str] = None
+) -> Optional[Row]:
+    """
+    UPDATE ... RETURNING one record
+
+    Pass user_id to make ownership part of the UPDATE; records already
+    checked with fetch_owned can omit it.
+
+    Returns:
+        The updated row, or None if there is no such record of the user
+    """
+    table = model.__table__
+    clauses = [table.c.id == record_id]
+    if user_id is not None:
+        clauses.append(table.c.user_id == user_id)
+    if not values:
+        # Nothing to write; answer with the current row
+        return (await db.execute(select(table).where(*clauses))).first()
+    return (await db.execute(
+        update(table).where(*clauses).values(**values).returning(table)
+    )).first()
+
+
+async def delete_owned(db: AsyncSession, model, record_id: str, user_id: str, not_found: str) -> Row:
+    """
+    DELETE ... RETURNING a record if it is the user's
+
+    The ownership check is part of the DELETE; only when nothing was
+    deleted is the record looked up again to tell 404 from 403.
+
+    Returns:
+        The deleted row
+
+    Raises:
+        HTTPException: 404 not_found if missing, 403 if another user's
+    """
+    table = model.__table__
+    row = (await db.execute(
+        delete(table).where(table.c.id == record_id, table.c.user_id == user_id).returning(table)
+    )).first()
+    if row is None:
+        await fetch_owned(db, model, record_id, user_id, not_found)
+        # Found and owned after all: it was deleted concurrently
+        raise HTTPException(status_code=404, detail=not_found)
+    return row
@@ -0,0 +1,75 @@
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode sort-key values into an opaque cursor
+
+    Datetimes are stored as ISO strings; decode_cursor turns them back
+    into datetimes from the types it is given.
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type] = (datetime, str)) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: The opaque cursor
+        types: The expected type of each position (datetime, int or str)
+
+    Raises:
+        HTTPException: If the cursor is malformed or a value has the wrong type
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Unexpected cursor shape")
+        for i, expected in enumerate(types):
+            if expected is datetime:
+                values[i] = datetime.fromisoformat(values[i])
+            # bool is an int to isinstance, but never a sort key
+            elif not isinstance(values[i], expected) or isinstance(values[i], bool):
+                raise TypeError("Unexpected cursor value")
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_paginate(query: Select, model, cursor: Optional[str], limit: int) -> Select:
+    """
+    Apply newest-first (date, id) keyset pagination to a select
+
+    Fetches one row more than limit so page_results can tell whether
+    another page exists.
+    """
+    if cursor:
+        date, record_id = decode_cursor(cursor, (datetime, str))
+        query = query.where(tuple_(model.date, model.id) < tuple_(date, record_id))
+    return query.order_by(model.date.desc(), model.id.desc()).limit(limit + 1)
+
+
+def page_results(rows: Sequence[Any], limit: int) -> Tuple[Sequence[Any], Optional[str]]:
+    """
+    Trim the lookahead row and build the cursor for the next page
+
+    Returns:
+        Tuple of (rows for this page, next cursor or None on the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.date, last.id)
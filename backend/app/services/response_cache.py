@@ -0,0 +1,280 @@
+"""
+Per-user cache of reference list responses
+
+Dogs, vets, medicines and custom events change rarely but are listed on
+every app load and after every dialog. Their encoded response bodies are
+cached under (user_id, route, data version and query string), so a
+repeat request is served after one small indexed read, without scanning
+a table or running the serializer. The data version is the user's write
+count over the tables the route reads (ROUTE_SOURCES, see
+app.services.versions); it moves with writes made outside the API too,
+such as command-line imports, so those never leave a stale entry
+reachable.
+
+Invalidation is write-through: publish_change, which every mutation
+calls after committing, drops the user's keys for the routes that change
+can alter (AFFECTED_ROUTES) before the mutation's response is sent. A
+request that read the database before an invalidation does not store
+its (possibly stale) result, and every entry also expires after a TTL,
+which bounds the drift of values computed from the clock (a medicine's
+run_out_date).
+
+The storage is a ResponseCacheBackend chosen by RESPONSE_CACHE_BACKEND:
+"memory" (per-process LRU, the default), "none", or "package.module:Class"
+for a backend a multi-worker deployment can share.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from fastapi import Depends, Request, Response
+from typing import Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import urlencode
+from app.database import DBUser
+from app.api.auth import get_current_user
+from app.services.versions import DataVersions, current_data_versions
+import importlib
+import threading
+import time
+import os
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "4096"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+# (user_id, route, data version and normalized query string)
+CacheKey = Tuple[str, str, str]
+
+# Cached routes whose responses a change to each record type can alter
+AFFECTED_ROUTES: Dict[str, Tuple[str, ...]] = {
+    "dog": ("dogs", "medicines"),  # Deleting a dog deletes its doses
+    "vet": ("vets",),
+    "medicine": ("medicines",),
+    "custom_event": ("custom_events",),
+    "medicine_event": ("medicines",),  # Stock totals and forecasts
+}
+
+# Tables each cached route's response is built from
+ROUTE_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "dogs": ("dogs",),
+    "vets": ("vets",),
+    "medicines": ("medicines", "medicine_events"),
+    "custom_events": ("custom_events",),
+}
+
+
+class ResponseCacheBackend(ABC):
+    """
+    Storage interface of the response cache
+
+    generation() is a counter that every invalidate() advances; callers
+    read it before querying and pass it to set(), which must drop the
+    value if the generation has moved on since. A shared backend keeps
+    the counter next to the entries (e.g. INCR in Redis), so an
+    invalidation in one worker stops stale writes from all of them.
+    """
+
+    @abstractmethod
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: CacheKey, body: bytes, generation: int) -> None:
+        ...
+
+    @abstractmethod
+    def generation(self) -> int:
+        ...
+
+    @abstractmethod
+    def invalidate(self, user_id: str, routes: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class NullBackend(ResponseCacheBackend):
+    """Caches nothing (RESPONSE_CACHE_BACKEND=none)"""
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        return None
+
+    def set(self, key: CacheKey, body: bytes, generation: int) -> None:
+        pass
+
+    def generation(self) -> int:
+        return 0
+
+    def invalidate(self, user_id: str, routes: Iterable[str]) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+class MemoryBackend(ResponseCacheBackend):
+    """
+    Per-process LRU bounded by entry count and by bytes
+
+    Least recently used entries are evicted once either cap is reached;
+    a body larger than max_bytes is never stored. A per-user key index
+    makes invalidation touch only that user's entries.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, tuple[float, bytes]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[CacheKey]] = {}
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    @staticmethod
+    def _size(key: CacheKey, body: bytes) -> int:
+        return len(body) + sum(len(part) for part in key)
+
+    def _remove(self, key: CacheKey) -> None:
+        _, body = self._entries.pop(key)
+        self._bytes -= self._size(key, body)
+        keys = self._keys_by_user[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[key[0]]
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: CacheKey, body: bytes, generation: int) -> None:
+        size = self._size(key, body)
+        if self.max_entries <= 0 or self.ttl_seconds <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                # Invalidated while the response was being built
+                self.stale_writes += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body)
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self, user_id: str, routes: Iterable[str]) -> None:
+        routes = set(routes)
+        if not routes:
+            return
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._keys_by_user.get(user_id, ()) if k[1] in routes]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "users": len(self._keys_by_user),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_writes": self.stale_writes,
+            }
+
+
+def load_backend(name: str) -> ResponseCacheBackend:
+    """Build the backend named by RESPONSE_CACHE_BACKEND"""
+    if name == "memory":
+        return MemoryBackend()
+    if name == "none":
+        return NullBackend()
+    module, _, cls = name.partition(":")
+    if not cls:
+        raise ValueError(f"RESPONSE_CACHE_BACKEND must be memory, none or module:Class, not {name!r}")
+    return getattr(importlib.import_module(module), cls)()
+
+
+response_cache = load_backend(RESPONSE_CACHE_BACKEND)
+
+
+def invalidate_for_change(user_id: str, entity_type: str) -> None:
+    """Drop the user's cached responses that a change to entity_type can alter"""
+    response_cache.invalidate(user_id, AFFECTED_ROUTES.get(entity_type, ()))
+
+
+class CachedResponse:
+    """A list request's entry in the response cache"""
+
+    def __init__(self, key: CacheKey):
+        self.key = key
+        self.generation = response_cache.generation()
+
+    @staticmethod
+    def _headers(response: Response) -> dict:
+        return {key: value for key, value in response.headers.items() if key != "content-length"}
+
+    def lookup(self, response: Response) -> Optional[Response]:
+        """
+        Return the cached response, if any
+
+        Args:
+            response: The route's Response parameter; its headers (ETag)
+                are carried over, as they belong to this request
+        """
+        body = response_cache.get(self.key)
+        if body is None:
+            return None
+        return Response(body, media_type="application/json", headers=self._headers(response))
+
+    def store(self, result: Response) -> Response:
+        """Cache a freshly built JSON response's body and return the response"""
+        response_cache.set(self.key, result.body, self.generation)
+        return result
+
+
+def cached_list(route: str):
+    """Build the FastAPI dependency giving a list request its cache entry"""
+    def dependency(
+        request: Request,
+        current_user: DBUser = Depends(get_current_user),
+        versions: DataVersions = Depends(current_data_versions)
+    ) -> CachedResponse:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return CachedResponse((current_user.id, route, f"{versions.of(ROUTE_SOURCES[route])}:{query}"))
+    return dependency
@@ -0,0 +1,167 @@
+"""
+Daily event rollups
+
+event_rollups holds, per dog, day and event type (or custom event), the
+number of events and the sum and count of their poo qualities. Event
+writes adjust the affected rows in the same transaction, so analytics
+read O(days) rollup rows instead of scanning events. rebuild_rollups
+recomputes the table from events, for backfills and repairs.
+"""
+from sqlalchemy import and_, delete, or_, select, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from app.database import DBEventRollup, DBEvent, EventType
+
+
+class EventSnapshot(NamedTuple):
+    """The event fields that rollups depend on"""
+    dog_id: str
+    day: date
+    event_type: Optional[EventType]
+    custom_event_id: Optional[str]
+    poo_quality: Optional[int]
+
+
+def snapshot(event) -> EventSnapshot:
+    """Capture an event (ORM object or pydantic model) for track_event"""
+    return EventSnapshot(event.dog_id, event.date.date(), event.event_type, event.custom_event_id, event.poo_quality)
+
+
+def aggregate(changes: Iterable[tuple]) -> List[dict]:
+    """
+    Sum (snapshot, sign) pairs into one delta row per rollup key
+
+    Returns:
+        Parameter rows for the upsert statement
+    """
+    deltas: Dict[tuple, dict] = {}
+    for event, sign in changes:
+        bucket = event.event_type.name if event.event_type else event.custom_event_id
+        key = (event.dog_id, event.day, bucket)
+        row = deltas.get(key)
+        if row is None:
+            row = deltas[key] = {
+                "dog_id": event.dog_id,
+                "day": event.day,
+                "bucket": bucket,
+                "event_type": event.event_type,
+                "custom_event_id": event.custom_event_id,
+                "count": 0,
+                "poo_quality_sum": 0,
+                "poo_quality_count": 0,
+            }
+        row["count"] += sign
+        if event.poo_quality is not None:
+            row["poo_quality_sum"] += sign * event.poo_quality
+            row["poo_quality_count"] += sign
+    return [row for row in deltas.values() if row["count"] or row["poo_quality_count"] or row["poo_quality_sum"]]
+
+
+def _upsert():
+    stmt = insert(DBEventRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=[DBEventRollup.dog_id, DBEventRollup.day, DBEventRollup.bucket],
+        set_={
+            "count": DBEventRollup.count + stmt.excluded["count"],
+            "poo_quality_sum": DBEventRollup.poo_quality_sum + stmt.excluded.poo_quality_sum,
+            "poo_quality_count": DBEventRollup.poo_quality_count + stmt.excluded.poo_quality_count,
+        }
+    )
+
+
+def _prune(rows: List[dict]):
+    # Rows a decrement emptied; leaving them would only cost space
+    keys = [(row["dog_id"], row["day"], row["bucket"]) for row in rows if row["count"] < 0]
+    if not keys:
+        return None
+    # SQLite only accepts a subquery on the right of a row-value IN
+    return delete(DBEventRollup).where(
+        or_(*(
+            and_(DBEventRollup.dog_id == dog_id, DBEventRollup.day == day, DBEventRollup.bucket == bucket)
+            for dog_id, day, bucket in keys
+        )),
+        DBEventRollup.count <= 0
+    )
+
+
+async def track_event(db: AsyncSession, before: Optional[EventSnapshot], after: Optional[EventSnapshot]) -> None:
+    """
+    Adjust rollups for a created (before=None), updated or deleted (after=None) event
+
+    Call in the same transaction as the event write.
+    """
+    changes = []
+    if before is not None:
+        changes.append((before, -1))
+    if after is not None:
+        changes.append((after, 1))
+    rows = aggregate(changes)
+    if not rows:
+        return
+    await db.execute(_upsert(), rows)
+    prune = _prune(rows)
+    if prune is not None:
+        await db.execute(prune)
+
+
+def apply_deltas(conn: Connection, rows: List[dict]) -> None:
+    """Apply aggregated deltas on a sync connection (bulk import)"""
+    if rows:
+        conn.execute(_upsert(), rows)
+        prune = _prune(rows)
+        if prune is not None:
+            conn.execute(prune)
+
+
+async def forget_rollups(db: AsyncSession, dog_id: Optional[str] = None, custom_event_id: Optional[str] = None) -> None:
+    """Drop the rollups of a dog or custom event whose events are being cascade-deleted"""
+    query = delete(DBEventRollup)
+    if dog_id is not None:
+        query = query.where(DBEventRollup.dog_id == dog_id)
+    if custom_event_id is not None:
+        query = query.where(DBEventRollup.custom_event_id == custom_event_id)
+    await db.execute(query)
+
+
+def rebuild_rollups(conn: Connection, dog_ids: Optional[List[str]] = None) -> int:
+    """
+    Recompute rollups from the events table with one INSERT ... SELECT
+
+    Args:
+        conn: Sync connection; the caller controls the transaction
+        dog_ids: Only rebuild these dogs (default: all)
+
+    Returns:
+        Number of rollup rows written
+    """
+    clear = delete(DBEventRollup)
+    day = func.date(DBEvent.date)
+    # Enums are stored by name, so the raw column already holds the bucket name
+    bucket = func.coalesce(DBEvent.event_type, DBEvent.custom_event_id)
+    source = select(
+        DBEvent.dog_id,
+        day,
+        bucket,
+        DBEvent.event_type,
+        DBEvent.custom_event_id,
+        func.count(),
+        func.coalesce(func.sum(DBEvent.poo_quality), 0),
+        func.count(DBEvent.poo_quality),
+    ).group_by(DBEvent.dog_id, day, bucket)
+
+    if dog_ids is not None:
+        clear = clear.where(DBEventRollup.dog_id.in_(dog_ids))
+        source = source.where(DBEvent.dog_id.in_(dog_ids))
+
+    conn.execute(clear)
+    result = conn.execute(
+        insert(DBEventRollup).from_select(
+            ["dog_id", "day", "bucket", "event_type", "custom_event_id",
+             "count", "poo_quality_sum", "poo_quality_count"],
+            source
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,206 @@
+"""
+Full-text search over notes with SQLite FTS5
+
+search_documents holds one row per searchable record: the notes of
+events, vet visits and medicine events, and the name and notes or
+description of vets and medicines, with the owning user and dog copied
+alongside. search_index is an external-content FTS5 table over it.
+
+Triggers on the source tables keep search_documents current on every
+write path (route handlers, cascades, bulk import), and triggers on
+search_documents keep the FTS index current, so the application never
+writes to either table itself. backfill_search rebuilds both from the
+source tables.
+"""
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import html
+import re
+
+SEARCH_TYPES = ("event", "vet_visit", "medicine_event", "vet", "medicine")
+
+# Sentinels marking matches in snippets, swapped for <mark> after escaping
+_OPEN, _CLOSE = "\x02", "\x03"
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY,
+        entity_type TEXT NOT NULL,
+        entity_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        dog_id TEXT,
+        title TEXT,
+        body TEXT
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_search_documents_entity ON search_documents (entity_type, entity_id)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body,
+        content='search_documents', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_index (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_index (search_index, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+]
+
+# Per source table: entity type, the columns whose change re-indexes a
+# row, and the document's columns, extra FROM table and WHERE clause,
+# written against a row alias (NEW in triggers, the table in backfills)
+_NOTES_ON_DOG = (
+    "{row}.id, dogs.user_id, {row}.dog_id, NULL, {row}.notes",
+    "dogs",
+    "dogs.id = {row}.dog_id AND {row}.notes IS NOT NULL AND {row}.notes != ''",
+)
+SOURCES = {
+    "events": ("event", "notes, dog_id", *_NOTES_ON_DOG),
+    "vet_visits": ("vet_visit", "notes, dog_id", *_NOTES_ON_DOG),
+    "medicine_events": ("medicine_event", "notes, dog_id", *_NOTES_ON_DOG),
+    "vets": ("vet", "name, notes", "{row}.id, {row}.user_id, NULL, {row}.name, {row}.notes", None, None),
+    "medicines": ("medicine", "name, description", "{row}.id, {row}.user_id, NULL, {row}.name, {row}.description", None, None),
+}
+
+
+def _document_insert(table: str, row: str, from_source: bool) -> str:
+    """INSERT ... SELECT producing the documents of a source table's rows"""
+    entity_type, _, columns, join, where = SOURCES[table]
+    tables = ([table] if from_source else []) + ([join] if join else [])
+    sql = (
+        "INSERT INTO search_documents (entity_type, entity_id, user_id, dog_id, title, body) "
+        f"SELECT '{entity_type}', {columns.format(row=row)}"
+    )
+    if tables:
+        sql += f" FROM {', '.join(tables)}"
+    if where:
+        sql += f" WHERE {where.format(row=row)}"
+    return sql
+
+
+def _triggers(table: str) -> List[str]:
+    entity_type, watched, _, _, _ = SOURCES[table]
+    insert = _document_insert(table, "NEW", from_source=False)
+    delete = f"DELETE FROM search_documents WHERE entity_type = '{entity_type}' AND entity_id = OLD.id"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {watched} ON {table} "
+        f"BEGIN {delete}; {insert}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete}; END",
+    ]
+
+
+def install_search(conn: Connection) -> None:
+    """Create the search tables and triggers (idempotent; SQLite only)"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in SCHEMA:
+        conn.exec_driver_sql(statement)
+    for table in SOURCES:
+        for statement in _triggers(table):
+            conn.exec_driver_sql(statement)
+
+
+def backfill_search(conn: Connection) -> int:
+    """
+    Rebuild the search documents and index from the source tables
+
+    Returns:
+        Number of documents indexed
+    """
+    install_search(conn)
+    # Emptying search_documents would fire one FTS delete per row; reset the index wholesale instead
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS search_documents_ad")
+    conn.exec_driver_sql("DELETE FROM search_documents")
+    conn.exec_driver_sql("INSERT INTO search_index (search_index) VALUES ('delete-all')")
+    install_search(conn)
+
+    for table in SOURCES:
+        conn.exec_driver_sql(_document_insert(table, table, from_source=True))
+    return conn.exec_driver_sql("SELECT COUNT(*) FROM search_documents").scalar()
+
+
+def match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query
+
+    Every word must match (in any order); the last word also matches as a
+    prefix so results update while typing. FTS5 syntax in the input is
+    treated as plain text.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def highlight(snippet: str) -> str:
+    """HTML-escape a snippet and wrap its matches in <mark>"""
+    return html.escape(snippet).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+async def search(
+    db: AsyncSession,
+    user_id: str,
+    query: str,
+    limit: int,
+    types: Optional[List[str]] = None,
+    dog_ids: Optional[List[str]] = None
+) -> List[dict]:
+    """
+    Ranked full-text search over one user's records
+
+    Returns:
+        Up to limit dicts with type, id, dog_id, title, snippet and score
+        (bm25; lower is better), best match first
+    """
+    match = match_query(query)
+    if match is None:
+        return []
+
+    params = {"match": match, "user_id": user_id, "limit": limit, "open": _OPEN, "close": _CLOSE}
+    clauses = ["search_index MATCH :match", "d.user_id = :user_id"]
+    bind = []
+    if types:
+        clauses.append("d.entity_type IN :types")
+        params["types"] = list(types)
+        bind.append(bindparam("types", expanding=True))
+    if dog_ids:
+        clauses.append("d.dog_id IN :dog_ids")
+        params["dog_ids"] = list(dog_ids)
+        bind.append(bindparam("dog_ids", expanding=True))
+
+    query = text(
+        "SELECT d.entity_type, d.entity_id, d.dog_id, d.title, "
+        "snippet(search_index, -1, :open, :close, '…', 16) AS snippet, "
+        # Names weigh more than notes
+        "bm25(search_index, 4.0, 1.0) AS score "
+        "FROM search_index JOIN search_documents d ON d.id = search_index.rowid "
+        f"WHERE {' AND '.join(clauses)} "
+        "ORDER BY score LIMIT :limit"
+    ).bindparams(*bind)
+    rows = (await db.execute(query, params)).all()
+
+    return [
+        {
+            "type": row.entity_type,
+            "id": row.entity_id,
+            "dog_id": row.dog_id,
+            "title": row.title,
+            "snippet": highlight(row.snippet or ""),
+            "score": row.score,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,106 @@
+"""
+Fast serialization and sparse fieldsets for list responses
+
+Returning ORM objects from a route with response_model=List[Model] makes
+FastAPI validate every object against the schema (from_attributes), then
+serialize the result again. For thousands of rows that per-object work
+dominates the request. The fast path instead selects only the columns
+the response needs, turns each Row into a plain dict and encodes the
+list with orjson in one call.
+
+fields=id,date,event_type narrows a list to those keys. The fieldset is
+parsed by a FastAPI dependency (see field_set) and compiled into a
+column select, so unrequested columns - notes, or a dog's base64
+profile_picture - are neither read from the database nor sent.
+
+The schema stays the route's response_model for the OpenAPI docs, but is
+not re-validated: the selected columns are the schema's fields and the
+database already holds valid values.
+"""
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy import Select, select
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from typing import Callable, Optional, Sequence, Type
+
+
+class FieldSet:
+    """
+    The response fields a list request asked for, in schema order
+
+    model is the ORM class whose columns back the fields; routes that
+    build their own select (the timeline) pass None and use names.
+    """
+
+    def __init__(self, schema: Type[BaseModel], model=None, fields: Optional[str] = None):
+        available = list(schema.model_fields)
+        if fields is None:
+            self.names = tuple(available)
+        else:
+            requested = [name.strip() for name in fields.split(",") if name.strip()]
+            if not requested:
+                raise HTTPException(status_code=400, detail="fields must name at least one field")
+            unknown = [name for name in dict.fromkeys(requested) if name not in schema.model_fields]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {', '.join(unknown)}")
+            self.names = tuple(name for name in available if name in requested)
+
+        self.model = model
+        # Fields computed in Python (e.g. a medicine's run_out_date) need the whole row
+        self.derived = model is not None and any(
+            not isinstance(getattr(model, name, None), InstrumentedAttribute)
+            for name in self.names
+        )
+
+    def select(self, *required: str) -> Select:
+        """
+        Select the requested columns, plus any the query itself needs
+        (e.g. date and id for the pagination cursor)
+        """
+        if self.derived:
+            return select(self.model)
+        names = dict.fromkeys(self.names + required)
+        return select(*(getattr(self.model, name) for name in names))
+
+    def project(self, rows: Sequence) -> list:
+        """Turn selected rows into dicts holding exactly the requested keys"""
+        names = self.names
+        if self.derived:
+            return [{name: getattr(row[0], name) for name in names} for row in rows]
+        # Requested columns come first in the select; extras are cut off by zip
+        return [dict(zip(names, row)) for row in rows]
+
+
+def field_set(schema: Type[BaseModel], model=None) -> Callable[..., FieldSet]:
+    """Build the FastAPI dependency parsing fields= for a list of schema"""
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description=f"Comma-separated {schema.__name__} fields to return (default: all)"
+        )
+    ) -> FieldSet:
+        return FieldSet(schema, model, fields)
+    return dependency
+
+
+def json_response(content, response: Optional[Response] = None) -> ORJSONResponse:
+    """
+    Encode already-projected content straight to a JSON response
+
+    Args:
+        content: Plain dicts and lists, e.g. from FieldSet.project
+        response: The route's Response parameter; headers set on it (ETag,
+            X-Next-Cursor) are carried over, as FastAPI only merges them
+            into responses it builds itself
+    """
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return ORJSONResponse(content, headers=headers)
+
+
+def json_rows(rows: Sequence, fields: FieldSet, response: Optional[Response] = None) -> ORJSONResponse:
+    """Project rows selected with fields.select and encode them as a JSON list"""
+    return json_response(fields.project(rows), response)
+
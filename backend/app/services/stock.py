@@ -0,0 +1,204 @@
+"""
+Medicine stock tracking
+
+Each medicine keeps running totals of the doses recorded against it:
+total_dosed over all time, and dosed_since_stock for doses dated on or
+after the day stock_on_hand was counted. Medicine event writes adjust
+both with a single UPDATE, so listing medicines never sums history.
+
+The dosing rate is kept as the average daily dose over the
+MEDICINE_RATE_WINDOW_DAYS days ending on the medicine's last dose,
+recomputed from the (medicine_id, date) index together with
+last_dosed_at whenever that medicine's doses change. Being anchored on
+the last dose rather than on the day of the write, it depends on history
+only. When the medicine is read, current_dose_rate fades it by the days
+since the last dose, the share of that window that has slid out of
+today's (assuming the doses were spread evenly over it), so the rate
+drops to 0 and the run-out forecast (DBMedicine.run_out_date) goes away
+once dosing stops, without any write. 'python -m app.cli rebuild-stock'
+refreshes every medicine.
+"""
+from sqlalchemy import bindparam, case, func, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from app.database import DBMedicine, DBMedicineEvent
+import os
+
+MEDICINE_RATE_WINDOW_DAYS = int(os.getenv("MEDICINE_RATE_WINDOW_DAYS", "14"))
+
+
+class DoseSnapshot(NamedTuple):
+    """The medicine event fields that stock totals depend on"""
+    medicine_id: str
+    date: datetime
+    dosage: float
+
+
+def snapshot(medicine_event) -> DoseSnapshot:
+    """Capture a medicine event for track_dose"""
+    return DoseSnapshot(medicine_event.medicine_id, medicine_event.date, medicine_event.dosage)
+
+
+def _counts_against_stock(dose_day):
+    # Stock is counted on a day; doses dated that day or later use it up
+    return or_(DBMedicine.stock_updated_at.is_(None), func.date(DBMedicine.stock_updated_at) <= dose_day)
+
+
+def dose_deltas(changes: Iterable[tuple]) -> List[dict]:
+    """
+    Sum (snapshot, sign) pairs into one dosage delta per medicine and day
+
+    Returns:
+        Parameter rows for the adjust statement
+    """
+    deltas: Dict[tuple, float] = {}
+    for dose, sign in changes:
+        key = (dose.medicine_id, dose.date.date().isoformat())
+        deltas[key] = deltas.get(key, 0) + sign * dose.dosage
+    return [
+        {"medicine": medicine_id, "day": day, "amount": amount}
+        for (medicine_id, day), amount in deltas.items()
+        if amount
+    ]
+
+
+def _adjust():
+    # Table-level, so a list of parameter rows runs as a plain executemany
+    medicines = DBMedicine.__table__
+    amount = bindparam("amount")
+    return (
+        update(medicines)
+        .where(medicines.c.id == bindparam("medicine"))
+        .values(
+            total_dosed=medicines.c.total_dosed + amount,
+            dosed_since_stock=medicines.c.dosed_since_stock + case(
+                (_counts_against_stock(bindparam("day")), amount), else_=0
+            )
+        )
+    )
+
+
+def _last_dose():
+    # Keeps its own medicine_events even when nested in a query over that table
+    return select(func.max(DBMedicineEvent.date)).where(
+        DBMedicineEvent.medicine_id == DBMedicine.id
+    ).correlate_except(DBMedicineEvent).scalar_subquery()
+
+
+def _recent_rate():
+    # The window ends on the last dose; NULL (no doses) matches nothing
+    recent = select(func.coalesce(func.sum(DBMedicineEvent.dosage), 0)).where(
+        DBMedicineEvent.medicine_id == DBMedicine.id,
+        DBMedicineEvent.date >= func.date(_last_dose(), f"-{MEDICINE_RATE_WINDOW_DAYS - 1} days")
+    ).scalar_subquery()
+    return recent / MEDICINE_RATE_WINDOW_DAYS
+
+
+def _rate_update(medicine_ids: Iterable[str]):
+    return (
+        update(DBMedicine)
+        .where(DBMedicine.id.in_(set(medicine_ids)))
+        .values(rate_at_last_dose=_recent_rate(), last_dosed_at=_last_dose())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _refresh(medicine_ids: Optional[Iterable[str]]):
+    dosage = func.coalesce(func.sum(DBMedicineEvent.dosage), 0)
+    total = select(dosage).where(DBMedicineEvent.medicine_id == DBMedicine.id).scalar_subquery()
+    since_stock = select(dosage).where(
+        DBMedicineEvent.medicine_id == DBMedicine.id,
+        _counts_against_stock(func.date(DBMedicineEvent.date))
+    ).scalar_subquery()
+    query = update(DBMedicine).values(
+        total_dosed=total,
+        dosed_since_stock=since_stock,
+        rate_at_last_dose=_recent_rate(),
+        last_dosed_at=_last_dose()
+    ).execution_options(synchronize_session=False)
+    if medicine_ids is not None:
+        query = query.where(DBMedicine.id.in_(set(medicine_ids)))
+    return query
+
+
+def current_dose_rate(medicine: DBMedicine, today: date) -> float:
+    """A medicine's rate_at_last_dose faded by the days since its last dose"""
+    if not medicine.rate_at_last_dose or medicine.last_dosed_at is None:
+        return 0.0
+    idle = (today - medicine.last_dosed_at.date()).days
+    if idle <= 0:
+        return medicine.rate_at_last_dose
+    return medicine.rate_at_last_dose * max(MEDICINE_RATE_WINDOW_DAYS - idle, 0) / MEDICINE_RATE_WINDOW_DAYS
+
+
+def forecast_run_out(medicine: DBMedicine, today: date) -> Optional[date]:
+    """Day the remaining stock runs out at the current rate, None without stock or dosing"""
+    remaining = medicine.stock_remaining
+    rate = current_dose_rate(medicine, today)
+    if remaining is None or not rate:
+        return None
+    return today + timedelta(days=remaining / rate)
+
+
+async def track_dose(db: AsyncSession, before: Optional[DoseSnapshot], after: Optional[DoseSnapshot]) -> None:
+    """
+    Adjust stock totals for a created (before=None), updated or deleted (after=None) medicine event
+
+    Call in the same transaction as the write, after the event has been
+    added, changed or deleted in the session.
+    """
+    if before == after:
+        return
+    changes = []
+    if before is not None:
+        changes.append((before, -1))
+    if after is not None:
+        changes.append((after, 1))
+    rows = dose_deltas(changes)
+    if rows:
+        await db.execute(_adjust(), rows)
+    # The rate query reads medicine_events, so write the pending change first
+    await db.flush()
+    await db.execute(_rate_update({dose.medicine_id for dose, _ in changes}))
+
+
+async def refresh_stock(db: AsyncSession, medicine_ids: Iterable[str]) -> None:
+    """Recompute totals and rate from history, e.g. after a cascading delete"""
+    medicine_ids = set(medicine_ids)
+    if medicine_ids:
+        await db.flush()
+        await db.execute(_refresh(medicine_ids))
+
+
+def apply_doses(conn: Connection, doses: Iterable[DoseSnapshot]) -> None:
+    """
+    Add newly inserted doses to stock totals on a sync connection (bulk import)
+
+    One UPDATE per medicine and day the doses fall on, then one rate
+    update for the medicines touched; history is never re-summed.
+    """
+    rows = dose_deltas((dose, 1) for dose in doses)
+    if rows:
+        conn.execute(_adjust(), rows)
+        conn.execute(_rate_update({row["medicine"] for row in rows}))
+
+
+def rebuild_stock(conn: Connection, medicine_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Recompute totals and rate from history on a sync connection
+
+    Used by the migration backfill and the CLI.
+
+    Returns:
+        Number of medicines updated
+    """
+    return conn.execute(_refresh(medicine_ids)).rowcount
+
+
+async def set_stock(db: AsyncSession, medicine: DBMedicine, stock_on_hand: float) -> None:
+    """Record a new stock count; doses dated from today on count against it"""
+    medicine.stock_on_hand = stock_on_hand
+    medicine.stock_updated_at = datetime.now()
+    await refresh_stock(db, [medicine.id])
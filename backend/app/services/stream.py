@@ -0,0 +1,150 @@
+"""
+In-process pub/sub for the /api/stream change feed
+
+publish_change hands every committed mutation to the ChangeHub, which
+fans it out to the user's open streams. Each subscriber has a bounded
+queue; the SSE frame is encoded once per change and shared by all of
+them, so an idle connection costs a queue and a parked coroutine.
+
+A subscriber that falls STREAM_QUEUE_SIZE changes behind is not allowed to
+hold the backlog: its queue is cleared and replaced with a single
+resync marker, telling the client to refetch instead of replaying. A
+slow phone therefore costs bounded memory and never slows publishers.
+"""
+from typing import Dict, Optional, Set
+import asyncio
+import orjson
+import os
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_RETRY_MILLISECONDS = int(os.getenv("STREAM_RETRY_MILLISECONDS", "5000"))
+
+# Queued in place of a dropped backlog; the stream turns it into a resync event
+RESYNC = object()
+
+
+def sse_frame(event: str, data: dict, event_id: Optional[str] = None) -> bytes:
+    """Encode one Server-Sent Event"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode() + orjson.dumps(data) + b"\n\n"
+
+
+class Subscription:
+    """One open stream: a bounded queue of encoded frames"""
+
+    __slots__ = ("user_id", "queue", "overflowed")
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, frame: bytes) -> bool:
+        """
+        Queue a frame without ever blocking the publisher
+
+        Returns:
+            False if the frame was not queued: the subscriber is behind and
+            is (now) only waiting to be told to resync
+        """
+        if self.overflowed:
+            # The pending resync covers this change too
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.overflowed = True
+            return False
+
+    async def next(self, timeout: float):
+        """
+        Wait for the next frame (or RESYNC)
+
+        Raises:
+            asyncio.TimeoutError: Nothing arrived within timeout
+        """
+        # asyncio.timeout, unlike wait_for, needs no extra task per wait
+        async with asyncio.timeout(timeout):
+            item = await self.queue.get()
+        if item is RESYNC:
+            self.overflowed = False
+        return item
+
+
+class ChangeHub:
+    """
+    Fans change notifications out to each user's open streams
+
+    Subscribers live on the event loop; publish may also be called from
+    worker threads, in which case delivery is scheduled onto the loop
+    (asyncio.Queue is not thread-safe).
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """Open a subscription on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: str, frame: bytes) -> None:
+        """Deliver an encoded frame to every stream of the user"""
+        if user_id not in self._subscribers or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(user_id, frame)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, user_id, frame)
+
+    def _deliver(self, user_id: str, frame: bytes) -> None:
+        self.published += 1
+        for subscription in tuple(self._subscribers.get(user_id, ())):
+            was_behind = subscription.overflowed
+            if subscription.offer(frame):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+                if not was_behind:
+                    self.overflows += 1
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+        }
+
+
+change_hub = ChangeHub()
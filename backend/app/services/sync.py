@@ -0,0 +1,94 @@
+"""
+Delta sync support
+
+Clients keep an opaque sync token and ask for what changed since. Rows
+are matched on updated_at; deletions are read from the tombstones table,
+which the delete handlers write to (including the children a delete
+cascades to). Tombstone IDs are assigned in commit order, so they are an
+exact position; updated_at comes from the application clock before
+commit, so the token is rewound by SYNC_OVERLAP_SECONDS and clients
+must treat returned rows as idempotent upserts.
+"""
+from fastapi import HTTPException
+from sqlalchemy import select, insert, literal, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from app.database import DBTombstone, DBEvent, DBVetVisit, DBMedicineEvent
+from app.services.pagination import encode_cursor, decode_cursor
+import os
+
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "90"))
+
+# Child records removed by each parent's delete-orphan cascade
+CASCADES = {
+    "dog": [
+        ("event", DBEvent, DBEvent.dog_id),
+        ("vet_visit", DBVetVisit, DBVetVisit.dog_id),
+        ("medicine_event", DBMedicineEvent, DBMedicineEvent.dog_id),
+    ],
+    "vet": [("vet_visit", DBVetVisit, DBVetVisit.vet_id)],
+    "medicine": [("medicine_event", DBMedicineEvent, DBMedicineEvent.medicine_id)],
+    "custom_event": [("event", DBEvent, DBEvent.custom_event_id)],
+}
+
+
+async def record_deletion(db: AsyncSession, user_id: str, entity_type: str, entity_id: str) -> None:
+    """
+    Record tombstones for a record about to be deleted and its cascaded children
+
+    Must run in the same transaction as the delete, before the children
+    are removed.
+    """
+    now = datetime.now()
+    db.add(DBTombstone(user_id=user_id, entity_type=entity_type, entity_id=entity_id, deleted_at=now))
+    for child_type, model, foreign_key in CASCADES.get(entity_type, []):
+        await db.execute(
+            insert(DBTombstone).from_select(
+                ["user_id", "entity_type", "entity_id", "deleted_at"],
+                select(literal(user_id), literal(child_type), model.id, literal(now)).where(foreign_key == entity_id)
+            )
+        )
+
+
+def make_token(as_of: datetime, tombstone_id: int) -> str:
+    """Encode a sync position"""
+    return encode_cursor(as_of - timedelta(seconds=SYNC_OVERLAP_SECONDS), tombstone_id)
+
+
+def parse_token(token: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a sync token
+
+    Returns:
+        (changed-since time, last seen tombstone ID), or None when the
+        client must do a full sync (no token, or older than tombstone retention)
+
+    Raises:
+        HTTPException: If the token is malformed
+    """
+    if not token:
+        return None
+    since, tombstone_id = decode_cursor(token, (datetime, int))
+    # Tokens carry the naive application clock; an offset means it was not one of ours
+    if since.tzinfo is not None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if since < datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return None
+    return since, tombstone_id
+
+
+def prune_tombstones(db, older_than_days: int = TOMBSTONE_RETENTION_DAYS) -> int:
+    """
+    Delete tombstones past the retention window (sync session)
+
+    Clients whose token is older than the window get a full sync instead.
+
+    Returns:
+        Number of tombstones removed
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    result = db.execute(delete(DBTombstone).where(DBTombstone.deleted_at < cutoff))
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,90 @@
+"""
+Per-user data versions kept by the database
+
+data_versions holds one counter per user and source table. Triggers on
+every table a list response is built from bump the owner's counter for
+that table in the same transaction as the write, so every write path
+(route handlers, cascades, bulk and command-line imports, stock and
+rollup rebuilds, an import that fails half way) moves it, and a
+rolled-back write does not. List ETags use the sum over all of a user's
+tables (see app.services.changes); the response cache keys each route
+on the sum over only the tables it reads, so logging an event does not
+evict the cached dog list (see app.services.response_cache).
+
+SQLite only, like the search triggers.
+"""
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List
+from app.database import get_db, DBDataVersion, DBUser
+from app.api.auth import get_current_user
+
+# Source table -> expression giving the owning user of a row alias
+OWNERS: Dict[str, str] = {
+    "dogs": "{row}.user_id",
+    "vets": "{row}.user_id",
+    "medicines": "{row}.user_id",
+    "custom_events": "{row}.user_id",
+    "events": "{row}.user_id",
+    "vet_visits": "{row}.user_id",
+    "medicine_events": "{row}.user_id",
+    "event_rollups": "(SELECT dogs.user_id FROM dogs WHERE dogs.id = {row}.dog_id)",
+}
+
+
+def _triggers(table: str) -> List[str]:
+    statements = []
+    for suffix, event, row in (("ai", "INSERT", "NEW"), ("au", "UPDATE", "NEW"), ("ad", "DELETE", "OLD")):
+        owner = OWNERS[table].format(row=row)
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} "
+            f"WHEN {owner} IS NOT NULL BEGIN "
+            f"INSERT INTO data_versions (user_id, source, version) VALUES ({owner}, '{table}', 1) "
+            "ON CONFLICT (user_id, source) DO UPDATE SET version = version + 1; END"
+        )
+    return statements
+
+
+def install_version_triggers(conn: Connection) -> None:
+    """Create the data_versions table and its triggers (idempotent; SQLite only)"""
+    if conn.dialect.name != "sqlite":
+        return
+    DBDataVersion.__table__.create(conn, checkfirst=True)
+    for table in OWNERS:
+        for statement in _triggers(table):
+            conn.exec_driver_sql(statement)
+
+
+class DataVersions:
+    """A user's data versions, by source table"""
+
+    def __init__(self, versions: Dict[str, int]):
+        self.versions = versions
+
+    @property
+    def total(self) -> int:
+        """Moves whenever any of the user's data changes"""
+        return sum(self.versions.values())
+
+    def of(self, sources: Iterable[str]) -> int:
+        """Moves whenever any of the given tables changes for the user"""
+        return sum(self.versions.get(source, 0) for source in sources)
+
+
+async def data_versions(db: AsyncSession, user_id: str) -> DataVersions:
+    """A user's current data versions (all 0 before their first write)"""
+    rows = await db.execute(
+        text("SELECT source, version FROM data_versions WHERE user_id = :user_id"),
+        {"user_id": user_id}
+    )
+    return DataVersions(dict(rows.all()))
+
+
+async def current_data_versions(
+    current_user: DBUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> DataVersions:
+    """Dependency giving the current user's data versions, read once per request"""
+    return await data_versions(db, current_user.id)
@@ -0,0 +1,161 @@
+"""
+Benchmark response compression per route
+
+Seeds a throwaway SQLite database with one user's dogs (with profile
+pictures), vets, medicines and history, then requests each route
+through the ASGI app (no network) with each encoding. Reports the bytes
+on the wire, the share saved against identity, and the CPU time the
+compressor spent per response.
+
+Usage (from backend/):
+    python -m benchmarks.compression [--events 20000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def picture(size: int = 320) -> bytes:
+    """A photo-like JPEG: a smooth gradient plus noise, different on every call"""
+    from PIL import Image
+
+    noise = Image.effect_noise((size, size), 40).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    output = io.BytesIO()
+    Image.blend(gradient, noise, 0.35).save(output, "JPEG", quality=85)
+    return output.getvalue()
+
+
+def seed(count: int) -> None:
+    from app.database import (
+        init_db, engine, DBUser, DBDog, DBVet, DBMedicine, DBEvent, DBMedicineEvent,
+        EventType, MedicineType, TimeOfDay
+    )
+
+    init_db()
+    now = datetime.now()
+    start = datetime(2015, 1, 1)
+    times = list(TimeOfDay)
+    with engine.begin() as conn:
+        conn.execute(DBUser.__table__.insert(), [{"id": "bench", "email": "bench@example.com", "name": "Bench"}])
+        conn.execute(DBDog.__table__.insert(), [
+            {"id": f"dog-{i}", "user_id": "bench", "name": f"Dog {i}",
+             "profile_picture": "data:image/jpeg;base64," + base64.b64encode(picture()).decode(),
+             "created_at": now, "updated_at": now}
+            for i in range(3)
+        ])
+        conn.execute(DBVet.__table__.insert(), [
+            {"id": f"vet-{i}", "user_id": "bench", "name": f"Vet {i}", "contact_info": f"0123 456 {i:03d}",
+             "notes": "Open weekdays", "created_at": now, "updated_at": now}
+            for i in range(20)
+        ])
+        conn.execute(DBMedicine.__table__.insert(), [
+            {"id": f"medicine-{i}", "user_id": "bench", "name": f"Medicine {i}", "type": MedicineType.TABLET,
+             "description": "Twice daily with food", "created_at": now, "updated_at": now}
+            for i in range(20)
+        ])
+        conn.execute(DBEvent.__table__.insert(), [
+            {
+                "id": f"event-{i:08d}",
+                "dog_id": f"dog-{i % 3}",
+                "user_id": "bench",
+                "event_type": EventType.POO,
+                "date": start + timedelta(hours=i),
+                "time_of_day": times[i % len(times)],
+                "poo_quality": i % 7 + 1,
+                "notes": f"note {i}" if i % 4 == 0 else None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(count)
+        ])
+        conn.execute(DBMedicineEvent.__table__.insert(), [
+            {
+                "id": f"dose-{i:08d}",
+                "dog_id": f"dog-{i % 3}",
+                "user_id": "bench",
+                "medicine_id": f"medicine-{i % 20}",
+                "date": start + timedelta(hours=i * 12),
+                "time_of_day": times[i % len(times)],
+                "dosage": 1.0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(count // 10)
+        ])
+
+
+async def measure(client, method: str, path: str, encoding: str, repeat: int, **kwargs) -> tuple:
+    """Wire bytes of one response and compressor CPU seconds per response"""
+    from app.services.compression import compression_stats
+
+    before = compression_stats.seconds
+    for _ in range(repeat):
+        response = await client.request(method, path, headers={"Accept-Encoding": encoding}, **kwargs)
+        response.raise_for_status()
+        assert response.headers.get("content-encoding", "identity") in (encoding, "identity")
+    return response.num_bytes_downloaded, (compression_stats.seconds - before) / repeat
+
+
+async def run(repeat: int) -> None:
+    import httpx
+    from app.main import app
+    from app.api.auth import get_current_user
+    from app.database import SessionLocal, DBUser
+
+    with SessionLocal() as db:
+        user = db.get(DBUser, "bench")
+        db.expunge(user)
+    app.dependency_overrides[get_current_user] = lambda: user
+    jpeg = picture()
+
+    cases = [
+        ("GET", "/api/dogs", {}),
+        ("GET", "/api/dogs?fields=id,name", {}),
+        ("GET", "/api/vets", {}),
+        ("GET", "/api/medicines", {}),
+        ("GET", "/api/events?all=true", {}),
+        ("GET", "/api/events?all=true&fields=id,date,event_type", {}),
+        ("GET", "/api/timeline?limit=200", {}),
+        ("GET", "/api/export?format=ndjson", {}),
+        ("GET", "/api/export?format=csv", {}),
+        ("POST", "/api/upload/image", {"files": {"file": ("dog.jpg", jpeg, "image/jpeg")}}),
+    ]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'route':<48}{'identity KiB':>13}" + "".join(
+            f"{name + ' KiB':>12}{'saved':>8}{'CPU ms':>9}" for name in ENCODINGS[1:]
+        ))
+        for method, path, kwargs in cases:
+            plain, _ = await measure(client, method, path, "identity", 1, **kwargs)
+            line = f"{method + ' ' + path:<48}{plain / 1024:>13,.1f}"
+            for encoding in ENCODINGS[1:]:
+                size, seconds = await measure(client, method, path, encoding, repeat, **kwargs)
+                line += f"{size / 1024:>12,.1f}{1 - size / plain:>8.0%}{seconds * 1000:>9.2f}"
+            print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="Events to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="Requests per route and encoding")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="barkly-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    seed(args.events)
+    asyncio.run(run(args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
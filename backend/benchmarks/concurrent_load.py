@@ -0,0 +1,183 @@
+"""
+Load test concurrent requests against one uvicorn worker
+
+Starts a single uvicorn worker on a throwaway SQLite database, seeds one
+user's dog and --events events over HTTP, then runs two scenarios:
+
+- reads: --concurrency GET /api/events?all=true and as many GET
+  /api/dogs at once, --rounds times; reports failed requests, p50/p95
+  latency per route and the wall time of a round
+- locked writer: another connection holds the database's write lock for
+  --lock-seconds while a few POST /api/events wait for it; reports the
+  /health latency seen meanwhile, i.e. whether waiting on SQLite stalls
+  the event loop for everyone else
+
+Everything goes over HTTP, so the script also runs against older trees:
+pass --app-dir with the backend/ directory of another checkout (e.g. the
+commit before the async session port) to compare.
+
+Usage (from backend/):
+    python -m benchmarks.concurrent_load [--events 2000] [--concurrency 40] [--app-dir DIR]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+HOST = "127.0.0.1"
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def timed(client, method: str, path: str, **kwargs) -> float:
+    """Latency of one request, or None if it failed (e.g. the server's pool ran dry)"""
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+    except httpx.HTTPError:
+        return None
+    if response.is_error:
+        return None
+    return time.perf_counter() - started
+
+
+async def seed(client, events: int) -> str:
+    dog = (await client.post("/api/dogs", json={"name": "Rex"})).raise_for_status().json()
+    # Small batches: the sync session layer holds a pooled connection per request
+    for offset in range(0, events, 10):
+        responses = await asyncio.gather(*(
+            client.post("/api/events", json={
+                "dog_id": dog["id"], "event_type": "Poo", "time_of_day": "Morning",
+                "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T00:00:00", "poo_quality": i % 7 + 1,
+            })
+            for i in range(offset, min(offset + 10, events))
+        ))
+        for response in responses:
+            response.raise_for_status()
+    return dog["id"]
+
+
+async def reads(client, concurrency: int, rounds: int) -> None:
+    latencies = {"/api/events?all=true": [], "/api/dogs": []}
+    walls = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        paths = [path for path in latencies for _ in range(concurrency)]
+        results = await asyncio.gather(*(timed(client, "GET", path) for path in paths))
+        walls.append(time.perf_counter() - started)
+        for path, seconds in zip(paths, results):
+            latencies[path].append(seconds)
+
+    for path, results in latencies.items():
+        values = [seconds for seconds in results if seconds is not None]
+        line = f"reads   GET {path:<24} failed {len(results) - len(values):>4}"
+        if values:
+            line += (f"  p50 {statistics.median(values) * 1000:>8.1f} ms"
+                     f"  p95 {percentile(values, 0.95) * 1000:>8.1f} ms")
+        print(line)
+    print(f"reads   round wall time p50 {statistics.median(walls):.2f} s")
+
+
+def hold_write_lock(path: str, seconds: float, locked: threading.Event) -> None:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    locked.set()
+    time.sleep(seconds)
+    conn.execute("ROLLBACK")
+    conn.close()
+
+
+async def locked_writer(client, database: str, dog_id: str, seconds: float) -> None:
+    locked = threading.Event()
+    holder = threading.Thread(target=hold_write_lock, args=(database, seconds, locked))
+    holder.start()
+    locked.wait()
+
+    writes = asyncio.gather(*(
+        client.post("/api/events", json={
+            "dog_id": dog_id, "event_type": "Poo", "time_of_day": "Morning", "date": "2024-06-01T00:00:00",
+        })
+        for _ in range(4)
+    ))
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        latency = await timed(client, "GET", "/health")
+        if latency is not None:
+            samples.append(latency)
+        await asyncio.sleep(0.02)
+    await writes
+    await asyncio.to_thread(holder.join)
+
+    print(f"locked  /health while writes wait {seconds:.1f}s: {len(samples)} answered, "
+          f"p50 {statistics.median(samples) * 1000:.1f} ms, max {max(samples) * 1000:.1f} ms")
+
+
+async def run(port: int, token: str, database: str, args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(
+        base_url=f"http://{HOST}:{port}", headers={"Authorization": f"Bearer {token}"},
+        limits=limits, timeout=120
+    ) as client:
+        dog_id = await seed(client, args.events)
+        await reads(client, 2, 1)  # Warm up
+        await reads(client, args.concurrency, args.rounds)
+        await locked_writer(client, database, dog_id, args.lock_seconds)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000, help="Events to seed")
+    parser.add_argument("--concurrency", type=int, default=40, help="Concurrent requests per route")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds of the read scenario")
+    parser.add_argument("--lock-seconds", type=float, default=1.0, help="How long the write lock is held")
+    parser.add_argument("--app-dir", default=".", help="backend/ directory of the tree to serve")
+    parser.add_argument("--port", type=int, default=8796)
+    args = parser.parse_args(argv)
+
+    app_dir = os.path.abspath(args.app_dir)
+    sys.path.insert(0, app_dir)
+    directory = tempfile.mkdtemp(prefix="barkly-bench-")
+    database = f"{directory}/bench.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    # One user sends far more than the admission rate allows
+    os.environ["ADMISSION_RATE_PER_SECOND"] = "0"
+    os.environ["ADMISSION_MAX_IN_FLIGHT"] = "0"
+    from app.services.auth_service import create_access_token
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", app_dir,
+         "--host", HOST, "--port", str(args.port), "--log-level", "warning"],
+        env=os.environ.copy()
+    )
+    try:
+        for _ in range(100):
+            try:
+                with socket.create_connection((HOST, args.port), timeout=0.1):
+                    break
+            except OSError:
+                time.sleep(0.1)
+        with sqlite3.connect(database) as conn:
+            conn.execute("INSERT INTO users (id, email, name) VALUES ('bench', 'bench@example.com', 'Bench')")
+        asyncio.run(run(args.port, create_access_token("bench"), database, args))
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
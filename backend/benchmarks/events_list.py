@@ -0,0 +1,126 @@
+"""
+Benchmark GET /api/events serialization
+
+Seeds a throwaway SQLite database with one user's events, then times the
+list endpoint through the ASGI app (no network) against a copy of the
+original handler, which returned ORM objects for FastAPI to validate
+against response_model=List[Event] and encode with the stdlib json, and
+with the sparse fieldset a timeline icon view needs.
+
+Usage (from backend/):
+    python -m benchmarks.events_list [--events 20000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def seed(count: int) -> None:
+    from app.database import init_db, engine, DBUser, DBDog, DBEvent, EventType, TimeOfDay
+
+    init_db()
+    now = datetime.now()
+    start = datetime(2015, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(DBUser.__table__.insert(), [{"id": "bench", "email": "bench@example.com", "name": "Bench"}])
+        conn.execute(DBDog.__table__.insert(), [
+            {"id": f"dog-{i}", "user_id": "bench", "name": f"Dog {i}", "created_at": now, "updated_at": now}
+            for i in range(3)
+        ])
+        times = list(TimeOfDay)
+        conn.execute(DBEvent.__table__.insert(), [
+            {
+                "id": f"event-{i:08d}",
+                "dog_id": f"dog-{i % 3}",
+                "user_id": "bench",
+                "event_type": EventType.POO,
+                "date": start + timedelta(hours=i),
+                "time_of_day": times[i % len(times)],
+                "poo_quality": i % 7 + 1,
+                "notes": f"note {i}" if i % 4 == 0 else None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(count)
+        ])
+
+
+def baseline_router():
+    """The list handler as it was before the fast path"""
+    from fastapi import APIRouter, Depends
+    from fastapi.responses import JSONResponse
+    from sqlalchemy import select
+    from typing import List
+    from app.api.auth import get_current_user
+    from app.database import get_db, DBDog, DBEvent
+    from app.models import Event
+
+    router = APIRouter()
+
+    @router.get("/baseline/events", response_model=List[Event], response_class=JSONResponse)
+    async def baseline_events(current_user=Depends(get_current_user), db=Depends(get_db)):
+        user_dog_ids = [dog.id for dog in (await db.scalars(select(DBDog).where(DBDog.user_id == current_user.id))).all()]
+        query = select(DBEvent).where(DBEvent.dog_id.in_(user_dog_ids))
+        return (await db.scalars(query.order_by(DBEvent.date.desc(), DBEvent.id.desc()))).all()
+
+    return router
+
+
+async def measure(client, path: str, repeat: int) -> tuple:
+    """Best-of-repeat wall time, row count and body size of one GET"""
+    best, rows, size = None, 0, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(path)
+        elapsed = time.perf_counter() - started
+        response.raise_for_status()
+        rows, size = len(response.json()), len(response.content)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows, size
+
+
+async def run(repeat: int) -> None:
+    import httpx
+    from app.main import app
+    from app.api.auth import get_current_user
+    from app.database import SessionLocal, DBUser
+
+    with SessionLocal() as db:
+        user = db.get(DBUser, "bench")
+        db.expunge(user)
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.include_router(baseline_router())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        cases = [
+            ("before, all=true", "/baseline/events"),
+            ("after, all=true", "/api/events?all=true"),
+            ("after, icon fields", "/api/events?all=true&fields=id,date,event_type,custom_event_id"),
+        ]
+        print(f"{'case':<20}{'rows':>8}{'seconds':>10}{'rows/s':>12}{'KiB':>10}")
+        for name, path in cases:
+            seconds, rows, size = await measure(client, path, repeat)
+            print(f"{name:<20}{rows:>8}{seconds:>10.3f}{rows / seconds:>12,.0f}{size / 1024:>10,.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="Events to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case; the best is reported")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="barkly-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    seed(args.events)
+    asyncio.run(run(args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
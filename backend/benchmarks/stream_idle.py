@@ -0,0 +1,168 @@
+"""
+Benchmark many idle /api/stream connections on one worker
+
+Starts a single uvicorn worker on a throwaway SQLite database, opens
+--connections SSE streams spread over --users users and leaves them
+idle. Reports the server's memory per connection, its CPU use while
+the streams only exchange heartbeats, /health latency with the streams
+open, and how long one change takes to reach every stream of a user.
+
+Usage (from backend/):
+    python -m benchmarks.stream_idle [--connections 5000] [--users 100]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HOST = "127.0.0.1"
+
+
+def seed(users: int) -> None:
+    from app.database import init_db, engine, DBUser
+
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(DBUser.__table__.insert(), [
+            {"id": f"user-{i}", "email": f"user{i}@example.com", "name": f"User {i}"}
+            for i in range(users)
+        ])
+
+
+def server_usage(pid: int) -> tuple:
+    """Resident memory (KiB) and CPU seconds used so far by a process"""
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return rss, (int(fields[11]) + int(fields[12])) / ticks
+
+
+async def request(port: int, path: str, token: str, method: str = "GET", body: bytes = b"") -> tuple:
+    """Plain HTTP/1.1 request on its own connection; returns (reader, writer, head)"""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    return reader, writer, head
+
+
+async def open_stream(port: int, token: str) -> tuple:
+    reader, writer, head = await request(port, "/api/stream", token)
+    if not head.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(head.decode())
+    await reader.readuntil(b"event: ready")
+    await reader.readuntil(b"\n\n")
+    return reader, writer
+
+
+async def health_latency(port: int, samples: int) -> list:
+    times = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(b"GET /health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+        await reader.read()
+        writer.close()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+async def run(port: int, pid: int, connections: int, users: int, idle: float) -> None:
+    from app.services.auth_service import create_access_token
+
+    tokens = [create_access_token(f"user-{i}") for i in range(users)]
+    rss_before, _ = server_usage(pid)
+    baseline = await health_latency(port, 20)
+
+    started = time.perf_counter()
+    streams = []
+    for offset in range(0, connections, 500):
+        batch = range(offset, min(offset + 500, connections))
+        streams += await asyncio.gather(*(open_stream(port, tokens[i % users]) for i in batch))
+    opened = time.perf_counter() - started
+    rss_after, cpu_before = server_usage(pid)
+    print(f"opened {len(streams)} streams for {users} users in {opened:.2f}s")
+    print(f"server RSS {rss_before / 1024:.1f} -> {rss_after / 1024:.1f} MiB "
+          f"({(rss_after - rss_before) / len(streams):.1f} KiB per stream)")
+
+    await asyncio.sleep(idle)
+    _, cpu_after = server_usage(pid)
+    print(f"server CPU while idle for {idle:.0f}s: {(cpu_after - cpu_before) / idle * 100:.1f}%")
+
+    loaded = await health_latency(port, 20)
+    print(f"/health p50 {statistics.median(baseline) * 1000:.1f} ms without streams, "
+          f"{statistics.median(loaded) * 1000:.1f} ms with them")
+
+    # One change fans out to every stream of user-0
+    targets = streams[::users]
+    started = time.perf_counter()
+    reader, writer, _ = await request(port, "/api/dogs", tokens[0], "POST", b'{"name": "Rex"}')
+    writer.close()
+
+    async def receive(stream_reader):
+        await stream_reader.readuntil(b"event: change")
+        return time.perf_counter() - started
+
+    arrivals = await asyncio.gather(*(receive(r) for r, _ in targets))
+    print(f"one change reached {len(targets)} streams: first {min(arrivals) * 1000:.1f} ms, "
+          f"last {max(arrivals) * 1000:.1f} ms")
+
+    for _, stream_writer in streams:
+        stream_writer.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=5000, help="Idle streams to open")
+    parser.add_argument("--users", type=int, default=100, help="Users the streams are spread over")
+    parser.add_argument("--idle", type=float, default=10, help="Seconds to sit idle while measuring CPU")
+    parser.add_argument("--heartbeat", type=float, default=5, help="STREAM_HEARTBEAT_SECONDS for the server")
+    parser.add_argument("--port", type=int, default=8795)
+    args = parser.parse_args(argv)
+
+    # Both ends hold one descriptor per stream
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = args.connections + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    directory = tempfile.mkdtemp(prefix="barkly-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["STREAM_HEARTBEAT_SECONDS"] = str(args.heartbeat)
+    # Each user opens its streams far faster than the admission rate allows
+    os.environ["ADMISSION_RATE_PER_SECOND"] = "0"
+    seed(args.users)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", HOST, "--port", str(args.port),
+         "--log-level", "warning", "--backlog", str(args.connections)],
+        env=os.environ.copy()
+    )
+    try:
+        for _ in range(100):
+            try:
+                with socket.create_connection((HOST, args.port), timeout=0.1):
+                    break
+            except OSError:
+                time.sleep(0.1)
+        asyncio.run(run(args.port, server.pid, args.connections, args.users, args.idle))
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,7 +23,9 @@ import {
   CustomEvent,
   CustomEventCreate,
   CustomEventUpdate,
-  UploadResponse
+  UploadResponse,
+  TimelinePage,
+  TimelineQuery
 } from '../types';
 import { getAuthHeader } from '../utils/auth';
 
@@ -279,7 +281,8 @@ export const apiClient = {
   // Event endpoints
   events: {
     getAll: (dogId?: string): Promise<Event[]> => {
-      const params = dogId ? `?dog_id=${dogId}` : '';
+      // all=true opts out of server-side pagination
+      const params = dogId ? `?all=true&dog_id=${dogId}` : '?all=true';
       return apiFetch<Event[]>(`/api/events${params}`, {
         headers: getAuthHeader(),
       });
@@ -318,7 +321,8 @@ export const apiClient = {
   // Vet Visit endpoints
   vetVisits: {
     getAll: (dogId?: string): Promise<VetVisit[]> => {
-      const params = dogId ? `?dog_id=${dogId}` : '';
+      // all=true opts out of server-side pagination
+      const params = dogId ? `?all=true&dog_id=${dogId}` : '?all=true';
       return apiFetch<VetVisit[]>(`/api/vet-visits${params}`, {
         headers: getAuthHeader(),
       });
@@ -357,7 +361,8 @@ export const apiClient = {
   // Medicine Event endpoints
   medicineEvents: {
     getAll: (dogId?: string): Promise<MedicineEvent[]> => {
-      const params = dogId ? `?dog_id=${dogId}` : '';
+      // all=true opts out of server-side pagination
+      const params = dogId ? `?all=true&dog_id=${dogId}` : '?all=true';
       return apiFetch<MedicineEvent[]>(`/api/medicine-events${params}`, {
         headers: getAuthHeader(),
       });
@@ -393,6 +398,23 @@ export const apiClient = {
     },
   },
 
+  // Timeline endpoint (events, vet visits and medicine events merged server-side)
+  timeline: {
+    getPage: (query: TimelineQuery = {}): Promise<TimelinePage> => {
+      const params = new URLSearchParams();
+      query.dogIds?.forEach(id => params.append('dog_id', id));
+      query.kinds?.forEach(kind => params.append('kind', kind));
+      query.eventTypes?.forEach(type => params.append('event_type', type));
+      query.customEventIds?.forEach(id => params.append('custom_event_id', id));
+      if (query.limit) params.set('limit', String(query.limit));
+      if (query.cursor) params.set('cursor', query.cursor);
+      const search = params.toString();
+      return apiFetch<TimelinePage>(`/api/timeline${search ? `?${search}` : ''}`, {
+        headers: getAuthHeader(),
+      });
+    },
+  },
+
   // Custom Event endpoints
   customEvents: {
     getAll: (): Promise<CustomEvent[]> => {
@@ -167,6 +167,13 @@ export interface Medicine {
   name: string;
   type: MedicineType;
   description?: string;
+  stock_on_hand?: number;
+  pack_size?: number;
+  stock_updated_at?: string;
+  stock_remaining?: number;
+  total_dosed: number;
+  daily_dose_rate: number;
+  run_out_date?: string;
   created_at: string;
   updated_at: string;
 }
@@ -175,12 +182,16 @@ export interface MedicineCreate {
   name: string;
   type: MedicineType;
   description?: string;
+  stock_on_hand?: number;
+  pack_size?: number;
 }
 
 export interface MedicineUpdate {
   name?: string;
   type?: MedicineType;
   description?: string;
+  stock_on_hand?: number;
+  pack_size?: number;
 }
 
 // Medicine Event types
@@ -230,3 +241,38 @@ export interface CustomEventCreate {
 export interface CustomEventUpdate {
   name?: string;
 }
+
+// Timeline types
+export type TimelineKind = 'event' | 'vet_visit' | 'medicine_event';
+
+export interface TimelineEntry {
+  kind: TimelineKind;
+  id: string;
+  dog_id: string;
+  date: string;
+  time_of_day: TimeOfDay;
+  event_type?: EventType;
+  custom_event_id?: string;
+  poo_quality?: number;
+  vomit_quality?: VomitQuality;
+  vet_id?: string;
+  medicine_id?: string;
+  dosage?: number;
+  notes?: string;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface TimelinePage {
+  items: TimelineEntry[];
+  next_cursor?: string;
+}
+
+export interface TimelineQuery {
+  dogIds?: string[];
+  kinds?: TimelineKind[];
+  eventTypes?: EventType[];
+  customEventIds?: string[];
+  limit?: number;
+  cursor?: string;
+}